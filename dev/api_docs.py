@@ -0,0 +1,17 @@
+"""Swagger / ReDoc views, loaded on first request by dev.urls"""
+from drf_yasg import openapi
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+schema_view = get_schema_view(
+    openapi.Info(
+        title="URL Shortener API",
+        default_version="v1",
+        description="API documentation for the URL shortener",
+    ),
+    public=True,
+    permission_classes=[permissions.AllowAny],
+)
+
+swagger_ui = schema_view.with_ui("swagger", cache_timeout=0)
+redoc_ui = schema_view.with_ui("redoc", cache_timeout=0)
@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+To serve redirects from the native async view, set ASYNC_REDIRECT=True and
+run under an ASGI worker, e.g.:
+
+    gunicorn dev.asgi:application -c dev/gunicorn_asgi.py
 """
 
 import os
@@ -0,0 +1,16 @@
+"""
+Gunicorn settings for serving dev.asgi:application with uvicorn workers.
+
+    ASYNC_REDIRECT=True gunicorn dev.asgi:application -c dev/gunicorn_asgi.py
+
+Each worker runs one event loop, so a redirect waiting on the cache or the
+database no longer ties up the whole process the way a sync worker does.
+"""
+import multiprocessing
+import os
+
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+graceful_timeout = 30
+keepalive = 5
@@ -53,7 +53,9 @@ INSTALLED_APPS = [
 SITE_ID = 1
 
 MIDDLEWARE = [
+    'shortener.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'shortener.middleware.RedirectFastLaneMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -67,7 +69,7 @@ ROOT_URLCONF = 'dev.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'shortener.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / "templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -82,6 +84,21 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'dev.wsgi.application'
 
+# Use the async redirect view; only worth it when serving dev.asgi:application
+ASYNC_REDIRECT = os.getenv("ASYNC_REDIRECT", "False") == "True"
+
+# Whether creating a link for a URL the user already shortened returns the
+# existing link by default; requests can override it with "dedupe"
+SHORTURL_DEDUPE_DEFAULT = os.getenv("SHORTURL_DEDUPE_DEFAULT", "False") == "True"
+
+# Serve GET /<code>/ without the session/auth/messages middleware
+REDIRECT_FAST_LANE = os.getenv("REDIRECT_FAST_LANE", "True") == "True"
+
+# max-age for cacheable (301 / "cached") redirects without their own cache_max_age
+REDIRECT_CACHE_MAX_AGE = int(os.getenv("REDIRECT_CACHE_MAX_AGE", "3600"))
+# Dotted path to a callable taking a list of URL paths ("/abc123/"), called
+# after a cacheable link is edited or deleted so a CDN can drop its copies
+REDIRECT_PURGE_HOOK = os.getenv("REDIRECT_PURGE_HOOK", "")
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
@@ -102,6 +119,45 @@ else:
             "PORT": os.getenv("DB_PORT"),
         }
     }
+
+# Optional read replica for redirects, the dashboard and API reads
+# (see shortener/routers.py)
+if os.getenv("DB_REPLICA_URL"):
+    DATABASES["replica"] = dj_database_url.parse(os.getenv("DB_REPLICA_URL"))
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["shortener.routers.ReplicaRouter"]
+
+# Seconds a user's reads stay on the primary after they change a link
+DB_REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", "10"))
+# Read from the primary while the replica is further behind than this many
+# seconds (PostgreSQL only); set to 0 to never check
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "30")) or None
+DB_REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_LAG_CHECK_INTERVAL", "5"))
+# Retry redirect lookups that miss on the replica against the primary
+DB_REPLICA_FALLBACK_ON_MISS = os.getenv("DB_REPLICA_FALLBACK_ON_MISS", "True") == "True"
+# Shared-cache lifetime of redirect entries read from the replica, which may
+# be stale; entries read from the primary keep SHORTURL_CACHE_TIMEOUT
+SHORTURL_REPLICA_CACHE_TIMEOUT = int(os.getenv("SHORTURL_REPLICA_CACHE_TIMEOUT", "60"))
+
+# Cache
+# Point REDIS_URL at a shared Redis in production so every worker sees the
+# same cache (and the same invalidations); otherwise each process keeps its own.
+
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -122,21 +178,22 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "shortener.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
 }
 
-from rest_framework_simplejwt.settings import api_settings
-
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Seconds the API may reuse a token's user without reloading it (0 disables)
+JWT_USER_CACHE_TIMEOUT = int(os.getenv("JWT_USER_CACHE_TIMEOUT", "300"))
+
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
 
@@ -161,11 +218,85 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Set to True in production to force HTTPS in generated short URLs
 USE_HTTPS = os.getenv("USE_HTTPS", "False") == "True"
 
+# Generated short keys: scramble sequence ids so keys aren't consecutive
+SHORT_KEY_PERMUTE = os.getenv("SHORT_KEY_PERMUTE", "True") == "True"
+SHORT_KEY_SALT = int(os.getenv("SHORT_KEY_SALT", "0"))
+
+DASHBOARD_PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "50"))
+
+# Rendered QR codes are cached (and marked cacheable by browsers) for this long
+QR_CACHE_TIMEOUT = int(os.getenv("QR_CACHE_TIMEOUT", "86400"))
+
+# GET /api/urls/ page sizes
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "100"))
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "1000"))
+
+# POST /api/urls/bulk/ limits
+BULK_CREATE_MAX_ITEMS = int(os.getenv("BULK_CREATE_MAX_ITEMS", "10000"))
+BULK_CREATE_CHUNK_SIZE = int(os.getenv("BULK_CREATE_CHUNK_SIZE", "1000"))
+
+# Short URL lookup cache: a bounded in-process LRU in front of CACHES["default"]
+SHORTURL_LRU_SIZE = int(os.getenv("SHORTURL_LRU_SIZE", "10000"))
+SHORTURL_LRU_TTL = int(os.getenv("SHORTURL_LRU_TTL", "10"))
+SHORTURL_CACHE_TIMEOUT = int(os.getenv("SHORTURL_CACHE_TIMEOUT", "3600"))
+SHORTURL_NEGATIVE_CACHE_TIMEOUT = int(os.getenv("SHORTURL_NEGATIVE_CACHE_TIMEOUT", "30"))
+
+# Bloom filter of existing short keys, answering unknown codes from memory.
+# Only active with a shared cache (REDIS_URL), which carries new keys between workers
+BLOOM_FILTER_ENABLED = os.getenv("BLOOM_FILTER_ENABLED", "True") == "True"
+BLOOM_FILTER_ERROR_RATE = float(os.getenv("BLOOM_FILTER_ERROR_RATE", "0.001"))
+BLOOM_FILTER_MIN_CAPACITY = int(os.getenv("BLOOM_FILTER_MIN_CAPACITY", "100000"))
+BLOOM_FILTER_REBUILD_INTERVAL = int(os.getenv("BLOOM_FILTER_REBUILD_INTERVAL", "3600"))
+
+# Click counting: "memory" buffers per worker, "cache" buffers in the shared cache
+CLICK_BUFFER_BACKEND = os.getenv("CLICK_BUFFER_BACKEND", "memory")
+CLICK_FLUSH_INTERVAL = float(os.getenv("CLICK_FLUSH_INTERVAL", "5"))
+CLICK_FLUSH_MAX_KEYS = int(os.getenv("CLICK_FLUSH_MAX_KEYS", "1000"))
+
+# Click event log (see shortener/events.py); rollups are refreshed by `manage.py rollup_clicks`
+CLICK_EVENTS_ENABLED = os.getenv("CLICK_EVENTS_ENABLED", "True") == "True"
+CLICK_EVENT_QUEUE_SIZE = int(os.getenv("CLICK_EVENT_QUEUE_SIZE", "10000"))
+CLICK_EVENT_BATCH_SIZE = int(os.getenv("CLICK_EVENT_BATCH_SIZE", "500"))
+CLICK_EVENT_FLUSH_INTERVAL = float(os.getenv("CLICK_EVENT_FLUSH_INTERVAL", "2"))
+
+# Request timing / query counting and the Prometheus /metrics endpoint.
+# /metrics accepts "Authorization: Bearer <METRICS_TOKEN>" or a staff session.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False") == "True"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Token-bucket rate limits per scope: {key: "count/period"}, where key is one of
+# ip, user, user_or_ip, username, email and period is s/m/h/d (e.g. "3/10m").
+RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "True") == "True"
+# Addresses/CIDRs of the load balancers, proxies and CDN edges in front of
+# the app. Client IPs are taken from X-Forwarded-For only past these hops;
+# without it every request behind a proxy shares the proxy's "ip" bucket.
+RATELIMIT_TRUSTED_PROXIES = [p for p in os.getenv("RATELIMIT_TRUSTED_PROXIES", "").split(",") if p.strip()]
+# Redirects are public and hot, so their per-IP limit is opt-in (e.g.
+# RATELIMIT_REDIRECT=300/m); set RATELIMIT_TRUSTED_PROXIES first when behind a
+# proxy or CDN, or one bucket would cap the whole site
+RATELIMIT_REDIRECT = os.getenv("RATELIMIT_REDIRECT", "")
+RATELIMIT_POLICIES = {
+    "redirect": {"ip": RATELIMIT_REDIRECT} if RATELIMIT_REDIRECT else {},
+    "create": {"user_or_ip": os.getenv("RATELIMIT_CREATE", "60/m")},
+    "bulk_create": {"user": os.getenv("RATELIMIT_BULK_CREATE", "10/m")},
+    "login": {"ip": "20/m", "username": os.getenv("RATELIMIT_LOGIN", "5/m")},
+    "register": {"ip": os.getenv("RATELIMIT_REGISTER", "10/h")},
+    "otp_request": {"ip": "10/h", "email": os.getenv("RATELIMIT_OTP_REQUEST", "3/10m")},
+    "otp_verify": {"ip": "30/h", "email": os.getenv("RATELIMIT_OTP_VERIFY", "5/10m")},
+}
+# Scopes whose buckets stay in worker memory (no cache round trip per request)
+RATELIMIT_LOCAL_SCOPES = ("redirect",)
+
+# Password-reset OTPs: "cache" keeps them in CACHES["default"] (needs Redis
+# when running several workers), "db" in the OneTimeCode table
+OTP_STORE = os.getenv("OTP_STORE", "cache" if os.getenv("REDIS_URL") else "db")
+OTP_TTL = int(os.getenv("OTP_TTL", "600"))
+
 # Email configuration (for password reset and OTP)
 if DEBUG:
-    EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+    EMAIL_DELIVERY_BACKEND = "django.core.mail.backends.console.EmailBackend"
 else:
-    EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+    EMAIL_DELIVERY_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
     EMAIL_HOST = os.getenv("EMAIL_HOST", "")
     EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
     EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
@@ -174,6 +305,26 @@ else:
 
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "no-reply@shortify.app")
 
+# Queue outgoing mail in the EmailOutbox table instead of sending it inside
+# the request; shortener.mail delivers it through EMAIL_DELIVERY_BACKEND
+EMAIL_OUTBOX_ENABLED = os.getenv("EMAIL_OUTBOX_ENABLED", "True") == "True"
+EMAIL_BACKEND = "shortener.mail.OutboxBackend" if EMAIL_OUTBOX_ENABLED else EMAIL_DELIVERY_BACKEND
+# Also deliver from a background thread in each web process (turn off when
+# `manage.py send_queued_mail --loop` runs as its own worker)
+EMAIL_OUTBOX_SEND_IN_PROCESS = os.getenv("EMAIL_OUTBOX_SEND_IN_PROCESS", "True") == "True"
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "100"))
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL", "5"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "5"))
+# Seconds before the first retry; doubled after every failed attempt
+EMAIL_OUTBOX_RETRY_DELAY = int(os.getenv("EMAIL_OUTBOX_RETRY_DELAY", "30"))
+# Seconds a sender may hold claimed rows before another sender retries them
+EMAIL_OUTBOX_CLAIM_TIMEOUT = int(os.getenv("EMAIL_OUTBOX_CLAIM_TIMEOUT", "300"))
+# Sent and failed rows older than this are deleted by `manage.py purge_outbox`
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", "7"))
+# Simulated SMTP latency for shortener.mail.LatencyBackend
+EMAIL_LATENCY_CONNECT = float(os.getenv("EMAIL_LATENCY_CONNECT", "0.2"))
+EMAIL_LATENCY_PER_MESSAGE = float(os.getenv("EMAIL_LATENCY_PER_MESSAGE", "0.01"))
+
 # Authentication backends for django-allauth and social login
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
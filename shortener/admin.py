@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import ShortURL, UserProfile
+from django.utils import timezone
+from .models import EmailOutbox, ShortURL, UserProfile
+from .search import search_links
 
 # Inline admin for UserProfile
 class UserProfileInline(admin.StackedInline):
@@ -48,16 +50,25 @@ class ShortURLAdmin(admin.ModelAdmin):
         "original_url",
         "user",
         "clicks",
+        "redirect_type",
         "created_at",
         "expires_at",
     )
 
     search_fields = ("short_key", "original_url", "user__username")
-    list_filter = ("created_at", "expires_at")
+    search_help_text = "Short key prefix, part of the URL (3+ characters) or exact username"
+    list_filter = ("redirect_type", "created_at", "expires_at")
     ordering = ("-created_at",)
 
     readonly_fields = ("clicks", "created_at")
 
+    def get_search_results(self, request, queryset, search_term):
+        # Indexed prefix/trigram search instead of icontains on every field
+        if not search_term.strip():
+            return queryset, False
+        by_owner = queryset.filter(user__username=search_term.strip())
+        return search_links(queryset, search_term) | by_owner, False
+
     fieldsets = (
         ("URL Info", {
             "fields": ("original_url", "short_key")
@@ -71,4 +82,23 @@ class ShortURLAdmin(admin.ModelAdmin):
         ("Expiration", {
             "fields": ("expires_at",)
         }),
+        ("Caching", {
+            "fields": ("redirect_type", "cache_max_age")
+        }),
     )
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ("subject", "recipients", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("recipients",)
+    ordering = ("-created_at",)
+    readonly_fields = ("payload", "attempts", "last_error", "created_at", "sent_at")
+    actions = ["retry_now"]
+
+    @admin.action(description="Retry selected messages now")
+    def retry_now(self, request, queryset):
+        queryset.exclude(status=EmailOutbox.SENT).update(
+            status=EmailOutbox.PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
@@ -0,0 +1,297 @@
+"""
+REST API views.
+
+Kept out of shortener.views so that Django REST framework and simplejwt are
+only imported when an API route is first hit (see utils.LazyView).
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from . import bulk, search
+from .bloom import key_filter
+from .models import DailyClickRollup, HourlyClickRollup, ShortURL
+from .pagination import keyset_page
+from .parsers import NDJSONParser
+from .ratelimit import ratelimit
+from .routers import use_replica
+from .utils import generate_short_key
+from .views import apply_redirect_policy, dedupe_requested
+
+token_obtain_pair = ratelimit("login")(TokenObtainPairView.as_view())
+
+
+def stream_json_array(queryset, chunk_size=2000):
+    """Yield ``queryset`` as a JSON array, reading it through a server-side cursor"""
+    encoder = DjangoJSONEncoder()
+    yield "["
+    first = True
+    buffer = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        buffer.append(encoder.encode(row))
+        if len(buffer) >= 500:
+            yield ("" if first else ",") + ",".join(buffer)
+            first = False
+            buffer = []
+    if buffer:
+        yield ("" if first else ",") + ",".join(buffer)
+    yield "]"
+
+
+#Api views for registration and URL CRUD
+@api_view(["POST"])
+@ratelimit("register")
+def api_register(request):
+    username = request.data.get("username")
+    password = request.data.get("password")
+
+    if User.objects.filter(username=username).exists():
+        return Response({"error": "Username already exists"}, status=400)
+
+    User.objects.create_user(username=username, password=password)
+    return Response({"message": "User registered successfully"}, status=201)
+
+
+
+@api_view(["POST", "GET"])
+@permission_classes([IsAuthenticated])
+@ratelimit("create", methods=("POST",))
+@use_replica
+def api_urls(request):
+    """
+    POST  -> Create short URL
+    GET   -> List user's URLs, newest first
+
+    POST takes "dedupe": true to get the user's existing link for the same
+    URL back (200, "existing": true) instead of a new one, and optionally
+    "redirect_type" (302, 307, 301 or cached) and "cache_max_age" (seconds).
+
+    GET takes ?page_size= and the ?cursor= returned as "next_cursor" by the
+    previous page, or ?stream=1 to receive every URL as one streamed array.
+    """
+
+    if request.method == "POST":
+        original_url = request.data.get("url")
+
+        dedupe = dedupe_requested(request.data.get("dedupe", request.query_params.get("dedupe")))
+        existing = dedupe and original_url and bulk.find_existing_link(request.user, original_url)
+        if existing:
+            return Response({
+                "id": existing.id,
+                "short_key": existing.short_key,
+                "original_url": existing.original_url,
+                "existing": True,
+            })
+
+        short = ShortURL(user=request.user, original_url=original_url)
+        error = apply_redirect_policy(short, request.data)
+        if error:
+            return Response({"error": error}, status=400)
+        short.short_key = generate_short_key()
+        short.save()
+
+        return Response({
+            "id": short.id,
+            "short_key": short.short_key,
+            "original_url": short.original_url
+        }, status=201)
+
+    if request.method == "GET":
+        urls = ShortURL.objects.filter(user=request.user).values(
+            "id", "original_url", "short_key", "clicks", "created_at"
+        )
+        ordering = ("-created_at", "-id")
+
+        if request.query_params.get("stream") in ("1", "true"):
+            # Bind the alias now: the body is read after the view returns
+            return StreamingHttpResponse(
+                stream_json_array(urls.using(urls.db).order_by(*ordering)),
+                content_type="application/json",
+            )
+
+        try:
+            page_size = int(request.query_params.get("page_size", settings.API_PAGE_SIZE))
+        except ValueError:
+            return Response({"error": "page_size must be an integer"}, status=400)
+        page_size = max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+        try:
+            rows, next_cursor = keyset_page(
+                urls, ordering, page_size, request.query_params.get("cursor")
+            )
+        except ValueError:
+            return Response({"error": "Invalid cursor"}, status=400)
+
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), "cursor", next_cursor
+            )
+        return Response({"results": rows, "next_cursor": next_cursor, "next": next_url})
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser, NDJSONParser])
+@ratelimit("bulk_create")
+def api_urls_bulk(request):
+    """
+    POST -> Create many short URLs at once
+
+    Body is a JSON array (or {"urls": [...], "dedupe": true}) or NDJSON, one
+    item per line. Each item is a URL string or {"url": ..., "expires_at": ...}.
+    With dedupe (or ?dedupe=1), URLs already shortened are returned as is.
+    """
+
+    items = request.data
+    dedupe = request.query_params.get("dedupe")
+    if isinstance(items, dict):
+        dedupe = items.get("dedupe", dedupe)
+        items = items.get("urls")
+    if not isinstance(items, list) or not items:
+        return Response({"error": "Expected a non-empty list of URLs"}, status=400)
+    if len(items) > settings.BULK_CREATE_MAX_ITEMS:
+        return Response(
+            {"error": f"At most {settings.BULK_CREATE_MAX_ITEMS} URLs per request"},
+            status=413,
+        )
+
+    results = bulk.create_short_urls(request.user, items, dedupe=dedupe_requested(dedupe))
+    failed = sum(1 for r in results if "error" in r)
+    existing = sum(1 for r in results if r.get("existing"))
+    created = len(results) - failed - existing
+    return Response({
+        "created": created,
+        "existing": existing,
+        "failed": failed,
+        "results": results,
+    }, status=201 if created or existing else 400)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@use_replica
+def api_urls_search(request):
+    """
+    GET -> Search the user's URLs, newest first
+
+    ?q= matches short keys by prefix and original URLs by substring (3+
+    characters); ?field=key or ?field=url restricts it to one of them.
+    Paginated like GET /api/urls/ (?page_size=, ?cursor=).
+    """
+
+    query = request.query_params.get("q", "").strip()
+    field = request.query_params.get("field", "any")
+    if not query:
+        return Response({"error": "q is required"}, status=400)
+    if field not in search.FIELDS:
+        return Response({"error": f"field must be one of {', '.join(search.FIELDS)}"}, status=400)
+
+    try:
+        page_size = int(request.query_params.get("page_size", settings.API_PAGE_SIZE))
+    except ValueError:
+        return Response({"error": "page_size must be an integer"}, status=400)
+    page_size = max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+    urls = search.search_links(ShortURL.objects.filter(user=request.user), query, field).values(
+        "id", "original_url", "short_key", "clicks", "created_at"
+    )
+    try:
+        rows, next_cursor = keyset_page(
+            urls, ("-created_at", "-id"), page_size, request.query_params.get("cursor")
+        )
+    except ValueError:
+        return Response({"error": "Invalid cursor"}, status=400)
+
+    next_url = None
+    if next_cursor:
+        next_url = replace_query_param(request.build_absolute_uri(), "cursor", next_cursor)
+    return Response({"results": rows, "next_cursor": next_cursor, "next": next_url})
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def api_bloom_stats(request):
+    """
+    GET -> Size and false-positive rate of this worker's short key Bloom filter
+    """
+
+    return Response(key_filter.stats())
+
+
+@api_view(["GET", "PUT", "DELETE"])
+@permission_classes([IsAuthenticated])
+@use_replica
+def api_url_detail(request, id):
+    """
+    GET    -> Retrieve single URL
+    PUT    -> Update URL
+    DELETE -> Delete URL
+    """
+
+    url = get_object_or_404(ShortURL, id=id, user=request.user)
+
+    if request.method == "GET":
+        return Response({
+            "id": url.id,
+            "original_url": url.original_url,
+            "short_key": url.short_key,
+            "clicks": url.clicks,
+            "created_at": url.created_at,
+            "redirect_type": url.redirect_type,
+            "cache_max_age": url.cache_max_age,
+        })
+
+    if request.method == "PUT":
+        url.original_url = request.data.get("url", url.original_url)
+        error = apply_redirect_policy(url, request.data)
+        if error:
+            return Response({"error": error}, status=400)
+        url.save()
+        return Response({"message": "URL updated successfully"})
+
+    if request.method == "DELETE":
+        url.delete()
+        return Response({"message": "URL deleted successfully"})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@use_replica
+def api_url_clicks(request, id):
+    """
+    GET -> Click counts per hour (default) or per day, from the rollup tables
+    """
+
+    url = get_object_or_404(ShortURL, id=id, user=request.user)
+    granularity = request.query_params.get("granularity", "hour")
+    if granularity not in ("hour", "day"):
+        return Response({"error": "granularity must be 'hour' or 'day'"}, status=400)
+
+    model = HourlyClickRollup if granularity == "hour" else DailyClickRollup
+    rows = model.objects.filter(short_key=url.short_key).order_by("bucket")
+    since = request.query_params.get("since")
+    if since:
+        parse = parse_datetime if granularity == "hour" else parse_date
+        try:
+            since = parse(since)
+        except ValueError:
+            since = None
+        if since is None:
+            return Response({"error": "Invalid 'since' value"}, status=400)
+        rows = rows.filter(bucket__gte=since)
+
+    return Response({
+        "short_key": url.short_key,
+        "granularity": granularity,
+        "buckets": list(rows.values("bucket", "clicks")),
+    })
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ShortenerConfig(AppConfig):
     name = 'shortener'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,69 @@
+"""
+JWT authentication that remembers who a token belongs to.
+
+JWTAuthentication loads the User row on every API request. This subclass
+keeps just what the token checks need (is_active and, when simplejwt
+revokes tokens on password change, the same password fingerprint a token
+carries) in the shared cache for up to JWT_USER_CACHE_TIMEOUT seconds (never
+past the token's expiry). A hit returns a User with only ``pk`` and
+``is_active`` loaded; other fields are fetched the first time a view reads
+them, so cheap endpoints don't pay a second query for authentication.
+
+The entry is dropped whenever the user is saved or deleted (signals.py,
+through usercache.py), which covers deactivation and password changes made
+through the ORM; queryset .update() calls bypass that and are only bounded
+by the timeout.
+With a process-local cache those invalidations would not reach the other
+workers, so the user is then loaded on every request as usual.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .usercache import user_cache_key
+from .utils import cache_is_shared
+
+
+def _password_fingerprint(user):
+    if not getattr(api_settings, "CHECK_REVOKE_TOKEN", False):
+        return None
+    from rest_framework_simplejwt.utils import get_md5_hash_password
+
+    return get_md5_hash_password(user.password)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or not settings.JWT_USER_CACHE_TIMEOUT or not cache_is_shared():
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        entry = cache.get(key)
+        if entry is None:
+            user = super().get_user(validated_token)
+            remaining = int(validated_token.get("exp", 0) - time.time())
+            timeout = min(settings.JWT_USER_CACHE_TIMEOUT, remaining)
+            if timeout > 0:
+                cache.set(key, (user.pk, user.is_active, _password_fingerprint(user)), timeout)
+            return user
+
+        pk, is_active, fingerprint = entry
+        # The checks JWTAuthentication makes after loading the user
+        if api_settings.CHECK_USER_IS_ACTIVE and not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if getattr(api_settings, "CHECK_REVOKE_TOKEN", False):
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != fingerprint:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+        # Remaining fields are deferred and load on first access
+        User = get_user_model()
+        return User.from_db(DEFAULT_DB_ALIAS, [User._meta.pk.attname, "is_active"], [pk, is_active])
@@ -0,0 +1,231 @@
+"""
+Per-process Bloom filter of existing short keys.
+
+The catch-all ``<str:code>/`` route sees a lot of requests for keys that
+were never issued (scanners, bots, typos). A Bloom filter answers "definitely
+not a key" from memory, so those requests never reach the cache or the
+database. False positives just fall through to the normal lookup.
+
+Workers learn about keys created elsewhere through a generation counter in
+the shared cache: every committed create bumps it and stores the new keys
+under that generation. A worker that sees a new generation on a miss first
+adds the keys of every generation it skipped, so keys from long transactions
+that commit below ids it has already seen are not lost. If any of those
+entries is gone it can't trust the filter and rebuilds it. Rows inserted
+without the creation signals (raw SQL) only show up at the next periodic
+rebuild (BLOOM_FILTER_REBUILD_INTERVAL).
+
+That only works when the cache is shared (Redis); with a per-process cache
+the filter is switched off, since a key created in another worker would look
+missing until the next rebuild.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from .models import ShortURL
+from .utils import cache_is_shared
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = "bloom:shorturl:generation"
+# Keys committed under one generation (GENERATION_KEYS_KEY % generation)
+GENERATION_KEYS_KEY = "bloom:shorturl:keys:%d"
+
+# A worker further than this many generations behind rebuilds instead
+MAX_CATCHUP_GENERATIONS = 1000
+PUBLISH_GRACE_GENERATIONS = 10
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one BLAKE2b digest"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray(math.ceil(self.num_bits / 8))
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        added = False
+        for pos in self._positions(key):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                added = True
+        # Re-adding a present key (e.g. during catch-up) doesn't count
+        if added:
+            self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def estimated_error_rate(self):
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "items": self.count,
+            "bits": self.num_bits,
+            "bytes": len(self.bits),
+            "hashes": self.num_hashes,
+            "target_error_rate": self.error_rate,
+            "estimated_error_rate": self.estimated_error_rate(),
+        }
+
+
+def bump_generation(*codes):
+    """Tell other workers that ``codes`` now exist (call after commit)"""
+    try:
+        generation = cache.incr(GENERATION_KEY)
+    except ValueError:
+        if cache.add(GENERATION_KEY, 1, None):
+            generation = 1
+        else:
+            generation = cache.incr(GENERATION_KEY)
+    cache.set(GENERATION_KEYS_KEY % generation, list(codes), settings.BLOOM_FILTER_REBUILD_INTERVAL)
+
+
+class KeyFilter:
+    """Keeps this process's BloomFilter built, current and swappable"""
+
+    def __init__(self):
+        self._filter = None
+        self._generation = None
+        self._built_at = 0.0
+        self._deleted = 0
+        self._building = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return settings.BLOOM_FILTER_ENABLED and cache_is_shared()
+
+    def _start_build(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self.build, name="bloom-build", daemon=True).start()
+
+    def build(self):
+        """Stream every short key from the database into a fresh filter"""
+        try:
+            close_old_connections()
+            generation = cache.get(GENERATION_KEY)
+            started = time.monotonic()
+            capacity = max(ShortURL.objects.count() * 2, settings.BLOOM_FILTER_MIN_CAPACITY)
+            bloom = BloomFilter(capacity, settings.BLOOM_FILTER_ERROR_RATE)
+            rows = ShortURL.objects.order_by().values_list("short_key", flat=True)
+            for key in rows.iterator(chunk_size=10000):
+                bloom.add(key)
+            with self._lock:
+                self._filter = bloom
+                self._generation = generation
+                self._deleted = 0
+                self._built_at = time.monotonic()
+            logger.info(
+                "Built short key Bloom filter: %d keys, %d bytes in %.2fs",
+                bloom.count, len(bloom.bits), time.monotonic() - started,
+            )
+        except Exception:
+            logger.exception("Building the short key Bloom filter failed")
+        finally:
+            self._building = False
+            close_old_connections()
+
+    def _needs_rebuild(self):
+        bloom = self._filter
+        return (
+            bloom.count > bloom.capacity
+            or self._deleted > bloom.count // 10
+            or time.monotonic() - self._built_at > settings.BLOOM_FILTER_REBUILD_INTERVAL
+        )
+
+    def contains(self, code):
+        """In-memory check only: False means "not present as of last sync".
+
+        Returns True whenever the filter can't answer (disabled or still
+        building), so callers fall back to the real lookup.
+        """
+        if not self.enabled:
+            return True
+        bloom = self._filter
+        if bloom is None:
+            self._start_build()
+            return True
+        if self._needs_rebuild():
+            self._start_build()
+        return code in bloom
+
+    def _catch_up(self, generation):
+        """Add keys committed since our generation; False if some are unknown"""
+        seen = self._generation or 0
+        if generation is None or generation < seen or generation - seen > MAX_CATCHUP_GENERATIONS:
+            # Counter evicted/reset, or too far behind to replay
+            self._start_build()
+            return False
+        wanted = {GENERATION_KEYS_KEY % g: g for g in range(seen + 1, generation + 1)}
+        published = cache.get_many(list(wanted))
+        missing = [g for key, g in wanted.items() if key not in published]
+        if missing:
+            # The newest entries may still be being written (incr, then set);
+            # anything older was evicted and only a rebuild can recover it
+            if min(missing) <= generation - PUBLISH_GRACE_GENERATIONS:
+                self._start_build()
+            return False
+        with self._lock:
+            for codes in published.values():
+                for key in codes:
+                    self._filter.add(key)
+            self._generation = generation
+        return True
+
+    def might_exist(self, code):
+        """False only if ``code`` is definitely not a short key"""
+        if self.contains(code):
+            return True
+        generation = cache.get(GENERATION_KEY)
+        if generation == self._generation:
+            return False
+        if not self._catch_up(generation):
+            return True
+        return code in self._filter
+
+    def add(self, *codes):
+        bloom = self._filter
+        if bloom is not None:
+            for code in codes:
+                bloom.add(code)
+
+    def note_deleted(self, count=1):
+        self._deleted += count
+
+    def stats(self):
+        bloom = self._filter
+        if bloom is None:
+            return {"ready": False, "enabled": self.enabled}
+        return {
+            "ready": True,
+            "deleted_since_build": self._deleted,
+            "age_seconds": round(time.monotonic() - self._built_at, 1),
+            **bloom.stats(),
+        }
+
+
+key_filter = KeyFilter()
@@ -0,0 +1,160 @@
+"""
+Bulk creation of short URLs.
+
+Items are validated up front, keys for all valid items are reserved in one
+allocator call, and rows are inserted with bulk_create in chunks inside a
+single transaction. With ``dedupe``, URLs the user has already shortened
+get their existing link back instead of a new row.
+"""
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.db.models import Q
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .keys import allocator
+from .models import ShortURL
+from .signals import short_urls_created
+from .utils import url_hash
+
+validate_url = URLValidator()
+URL_MAX_LENGTH = ShortURL._meta.get_field("original_url").max_length
+CUSTOM_KEY = re.compile(r"^[A-Za-z0-9_-]{1,20}$")
+
+
+def clean_item(item):
+    """Return (fields, error) for one input item (a URL string or an object)"""
+    if isinstance(item, str):
+        item = {"url": item}
+    if not isinstance(item, dict):
+        return None, "Item must be a URL string or an object"
+
+    url = item.get("url")
+    if not url or not isinstance(url, str):
+        return None, "'url' is required"
+    if len(url) > URL_MAX_LENGTH:
+        return None, f"URL is longer than {URL_MAX_LENGTH} characters"
+    try:
+        validate_url(url)
+    except ValidationError:
+        return None, "Enter a valid URL"
+
+    expires_at = item.get("expires_at")
+    if expires_at:
+        try:
+            expires_at = parse_datetime(str(expires_at))
+        except ValueError:
+            expires_at = None
+        if expires_at is None:
+            return None, "Invalid 'expires_at' datetime"
+        if timezone.is_naive(expires_at):
+            expires_at = timezone.make_aware(expires_at)
+
+    return {"original_url": url, "expires_at": expires_at or None, "url_hash": url_hash(url)}, None
+
+
+def check_custom_key(key):
+    """Return an error message if ``key`` can't be used as a caller-chosen short key.
+
+    Keys in the allocator's space (keys.is_reserved) pass; callers must
+    treat those as conflicts, since the allocator may mint them later.
+    """
+    if not CUSTOM_KEY.match(key):
+        return "Short key must be 1-20 letters, digits, '-' or '_'"
+    try:
+        match = resolve(f"/{key}/")
+    except Resolver404:
+        return "Short key is not routable"
+    if match.url_name != "redirect":
+        return "Short key clashes with a site URL"
+    return None
+
+
+def existing_links(user, hashes):
+    """Map url_hash -> the user's oldest unexpired link for it, in one indexed query"""
+    if not hashes:
+        return {}
+    links = (
+        ShortURL.objects.filter(user=user, url_hash__in=set(hashes))
+        .filter(Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()))
+        .only("id", "short_key", "original_url", "url_hash")
+        .order_by("-id")
+    )
+    return {link.url_hash: link for link in links}
+
+
+def find_existing_link(user, url):
+    """The user's existing link for ``url`` (after normalization), or None"""
+    digest = url_hash(url)
+    return existing_links(user, [digest]).get(digest)
+
+
+def create_short_urls(user, items, chunk_size=None, dedupe=False):
+    """Validate and insert ``items``; returns one result dict per item.
+
+    With ``dedupe``, items without an expiry whose URL the user already
+    shortened (or that repeat an earlier item) reuse that link and are
+    reported with "existing": true.
+    """
+    chunk_size = chunk_size or settings.BULK_CREATE_CHUNK_SIZE
+    results = [None] * len(items)
+    rows, positions = [], []
+    cleaned = [clean_item(item) for item in items]
+    existing = {}
+    if dedupe:
+        existing = existing_links(user, [
+            fields["url_hash"] for fields, error in cleaned if not error and not fields["expires_at"]
+        ])
+    repeats = []
+    for index, (fields, error) in enumerate(cleaned):
+        if error:
+            results[index] = {"index": index, "error": error}
+            continue
+        if dedupe and not fields["expires_at"]:
+            link = existing.get(fields["url_hash"])
+            if link is not None:
+                if link.pk is None:  # created earlier in this request
+                    repeats.append((index, link))
+                else:
+                    results[index] = _result(index, link, existing=True)
+                continue
+        row = ShortURL(user=user, **fields)
+        if dedupe and not fields["expires_at"]:
+            existing[fields["url_hash"]] = row
+        rows.append(row)
+        positions.append(index)
+
+    # Reserve keys before opening the transaction
+    for row, key in zip(rows, allocator.next_keys(len(rows))):
+        row.short_key = key
+
+    with transaction.atomic():
+        for start in range(0, len(rows), chunk_size):
+            ShortURL.objects.bulk_create(rows[start:start + chunk_size])
+
+    short_urls_created.send(
+        sender=ShortURL, short_keys=[row.short_key for row in rows], user_id=user.id,
+    )
+
+    for index, row in zip(positions, rows):
+        results[index] = _result(index, row)
+    for index, row in repeats:
+        results[index] = _result(index, row, existing=True)
+    return results
+
+
+def _result(index, link, existing=False):
+    result = {
+        "index": index,
+        "id": link.id,
+        "short_key": link.short_key,
+        "original_url": link.original_url,
+    }
+    if existing:
+        result["existing"] = True
+    return result
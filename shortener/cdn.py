@@ -0,0 +1,30 @@
+"""
+Purging cached redirects.
+
+Cacheable redirects (ShortURL.CACHEABLE_REDIRECTS) can be served by a CDN
+for up to their max-age. When such a link is edited or deleted, signals.py
+calls ``purge()`` after the transaction commits, which hands the affected
+paths to settings.REDIRECT_PURGE_HOOK.
+"""
+import logging
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def purge(*short_keys):
+    if not settings.REDIRECT_PURGE_HOOK:
+        return
+    paths = [f"/{key}/" for key in short_keys if key]
+    try:
+        import_string(settings.REDIRECT_PURGE_HOOK)(paths)
+    except Exception:
+        # The edit is committed either way; the CDN copy expires on its own
+        logger.exception("CDN purge failed for %s", paths)
+
+
+def log_purge(paths):
+    """Example hook: log what would be purged"""
+    logger.info("Purge %s", " ".join(paths))
@@ -0,0 +1,198 @@
+"""
+Buffered click counting.
+
+Redirects call ``record()`` instead of writing to the database. Increments
+are aggregated per ShortURL and written by a background flusher as
+``UPDATE ... SET clicks = clicks + n``, so the database sees one write per
+link per flush window however many clicks it received.
+
+Two buffers are available (settings.CLICK_BUFFER_BACKEND):
+
+* ``memory`` keeps counts in the worker process and flushes them on a timer,
+  when CLICK_FLUSH_MAX_KEYS links are pending, and at process exit.
+* ``cache`` keeps counts in the shared cache, bucketed into fixed time
+  windows, so they survive a worker crash and can be drained by any process
+  (including ``manage.py flush_clicks`` at shutdown).
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import ShortURL
+from .utils import BackgroundFlusher
+
+stats = {"flushes": 0, "rows": 0, "clicks": 0, "errors": 0, "last_flush_seconds": 0.0}
+
+
+def apply_counts(counts):
+    """Write {short_url_id: n} to the database, one UPDATE per distinct n"""
+    by_amount = defaultdict(list)
+    for pk, n in counts.items():
+        if n:
+            by_amount[n].append(pk)
+    if not by_amount:
+        return
+    started = time.perf_counter()
+    with transaction.atomic():
+        for n, ids in by_amount.items():
+            ShortURL.objects.filter(id__in=ids).update(clicks=F("clicks") + n)
+    stats["flushes"] += 1
+    stats["rows"] += len(counts)
+    stats["clicks"] += sum(counts.values())
+    stats["last_flush_seconds"] = time.perf_counter() - started
+
+
+class MemoryClickBuffer:
+    """Per-process click counts, flushed by a background thread"""
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, pk, n=1):
+        with self._lock:
+            self._counts[pk] += n
+            return len(self._counts) >= self.max_keys
+
+    def pending(self):
+        with self._lock:
+            return sum(self._counts.values())
+
+    def flush(self, include_open=False):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        try:
+            apply_counts(counts)
+        except Exception:
+            # Put the counts back so no click is lost; retried next window
+            with self._lock:
+                self._counts.update(counts)
+            stats["errors"] += 1
+            raise
+
+
+class CacheClickBuffer:
+    """Click counts kept in the shared cache, one bucket per time window.
+
+    A window only receives increments while it is current, so once it has
+    closed (plus a grace period) it can be read and deleted without racing
+    writers. Each window keeps an index of the links it saw so the drainer
+    never has to scan the cache.
+    """
+
+    prefix = "clicks:"
+
+    def __init__(self, interval, grace=2, retention=6 * 3600):
+        self.interval = interval
+        self.grace = grace
+        self.retention = retention
+
+    def _window(self, now=None):
+        return int((now or time.time()) // self.interval)
+
+    def _incr(self, key, n=1):
+        try:
+            return cache.incr(key, n)
+        except ValueError:
+            if cache.add(key, n, self.retention):
+                return n
+            return cache.incr(key, n)
+
+    def add(self, pk, n=1):
+        window = self._window()
+        counter = f"{self.prefix}{window}:{pk}"
+        if cache.add(counter, n, self.retention):
+            slot = self._incr(f"{self.prefix}{window}:n")
+            cache.set(f"{self.prefix}{window}:k:{slot}", pk, self.retention)
+        else:
+            self._incr(counter, n)
+        return False
+
+    def pending(self):
+        return None
+
+    def flush(self, include_open=False):
+        """Drain closed windows; with ``include_open``, also take what the
+        windows still receiving clicks hold so far (without closing them)"""
+        if not cache.add(f"{self.prefix}lock", 1, 60):
+            return  # another process is draining
+        try:
+            now = self._window()
+            last = self._window(time.time() - self.grace) - 1
+            first = cache.get(f"{self.prefix}drained")
+            if first is None:
+                first = now - int(self.retention // self.interval)
+            for window in range(first + 1, last + 1):
+                self._drain_window(window)
+                cache.set(f"{self.prefix}drained", window, None)
+            if include_open:
+                for window in range(max(first, last) + 1, now + 1):
+                    self._drain_window(window, closed=False)
+        finally:
+            cache.delete(f"{self.prefix}lock")
+
+    def _drain_window(self, window, closed=True):
+        base = f"{self.prefix}{window}:"
+        size = cache.get(base + "n") or 0
+        if not size:
+            return
+        slots = [f"{base}k:{i}" for i in range(1, size + 1)]
+        pks = cache.get_many(slots).values()
+        counters = {f"{base}{pk}": pk for pk in pks}
+        counts = {counters[k]: n for k, n in cache.get_many(list(counters)).items()}
+        if not closed:
+            # Writers may still increment these counters: subtract exactly
+            # what was read and leave the window (and its index) in place
+            counts = {pk: n for pk, n in counts.items() if n}
+            for pk, n in counts.items():
+                self._incr(f"{base}{pk}", -n)
+        try:
+            apply_counts(counts)
+        except Exception:
+            if not closed:
+                for pk, n in counts.items():
+                    self._incr(f"{base}{pk}", n)
+            stats["errors"] += 1
+            raise
+        if closed:
+            cache.delete_many(slots + list(counters) + [base + "n"])
+
+
+def _make_buffer():
+    if settings.CLICK_BUFFER_BACKEND == "cache":
+        return CacheClickBuffer(settings.CLICK_FLUSH_INTERVAL)
+    return MemoryClickBuffer(settings.CLICK_FLUSH_MAX_KEYS)
+
+
+buffer = _make_buffer()
+flusher = BackgroundFlusher("click-flusher", buffer.flush, settings.CLICK_FLUSH_INTERVAL)
+
+
+def record(short_url_id, n=1):
+    """Count a click without touching the database on the request path"""
+    flusher.ensure_started()
+    if buffer.add(short_url_id, n):
+        flusher.poke()
+
+
+async def arecord(short_url_id, n=1):
+    """record() for async views; the cache buffer does network I/O"""
+    if isinstance(buffer, CacheClickBuffer):
+        await sync_to_async(record, thread_sensitive=False)(short_url_id, n)
+    else:
+        record(short_url_id, n)
+
+
+def flush(include_open=False):
+    """Write buffered clicks to the database now.
+
+    The cache buffer drains closed windows only unless ``include_open``.
+    """
+    buffer.flush(include_open=include_open)
@@ -0,0 +1,135 @@
+"""
+Click event log.
+
+Redirects put a ClickEvent on an in-process queue; a background flusher
+writes queued events with bulk_create in batches, off the request path.
+``refresh_rollups()`` then folds new events into the hourly and daily rollup
+tables so analytics never scan the raw log.
+"""
+import hashlib
+import queue
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import ClickEvent, DailyClickRollup, HourlyClickRollup, RollupCheckpoint
+from .utils import BackgroundFlusher
+
+stats = {"queued": 0, "written": 0, "dropped": 0}
+
+pending = queue.Queue(maxsize=settings.CLICK_EVENT_QUEUE_SIZE)
+
+
+def hash_user_agent(user_agent):
+    if not user_agent:
+        return ""
+    return hashlib.sha1(user_agent.encode()).hexdigest()[:16]
+
+
+def enqueue(short_key, request):
+    """Queue a click for ``short_key``; never blocks the redirect"""
+    if not settings.CLICK_EVENTS_ENABLED:
+        return
+    flusher.ensure_started()
+    event = ClickEvent(
+        short_key=short_key,
+        timestamp=timezone.now(),
+        referrer=request.META.get("HTTP_REFERER", "")[:500],
+        user_agent_hash=hash_user_agent(request.META.get("HTTP_USER_AGENT", "")),
+    )
+    try:
+        pending.put_nowait(event)
+    except queue.Full:
+        stats["dropped"] += 1
+        return
+    stats["queued"] += 1
+    if pending.qsize() >= settings.CLICK_EVENT_BATCH_SIZE:
+        flusher.poke()
+
+
+def write_pending():
+    """Drain the queue into the database in bulk_create batches"""
+    batch_size = settings.CLICK_EVENT_BATCH_SIZE
+    while True:
+        batch = []
+        try:
+            while len(batch) < batch_size:
+                batch.append(pending.get_nowait())
+        except queue.Empty:
+            pass
+        if not batch:
+            return
+        ClickEvent.objects.bulk_create(batch, batch_size=batch_size)
+        stats["written"] += len(batch)
+
+
+flusher = BackgroundFlusher("click-events", write_pending, settings.CLICK_EVENT_FLUSH_INTERVAL)
+
+
+def _merge(model, rows):
+    """Add {(short_key, bucket): n} onto existing rollup rows"""
+    if not rows:
+        return
+    keys = {key for key, _ in rows}
+    buckets = {bucket for _, bucket in rows}
+    existing = {
+        (r.short_key, r.bucket): r
+        for r in model.objects.filter(short_key__in=keys, bucket__in=buckets)
+    }
+    to_update, to_create = [], []
+    for (key, bucket), n in rows.items():
+        row = existing.get((key, bucket))
+        if row is None:
+            to_create.append(model(short_key=key, bucket=bucket, clicks=n))
+        else:
+            row.clicks += n
+            to_update.append(row)
+    model.objects.bulk_update(to_update, ["clicks"], batch_size=1000)
+    model.objects.bulk_create(to_create, batch_size=1000)
+
+
+def refresh_rollups(max_events=50000, lag_seconds=60):
+    """Fold the next chunk of unprocessed events into the rollup tables.
+
+    Only events older than ``lag_seconds`` are taken so batches still being
+    inserted by other workers are never skipped. Returns the number of
+    events processed; call repeatedly until it returns 0 to catch up.
+    """
+    cutoff = timezone.now() - timedelta(seconds=lag_seconds)
+    with transaction.atomic():
+        checkpoint, _ = RollupCheckpoint.objects.select_for_update().get_or_create(name="clicks")
+        last = checkpoint.last_event_id
+        upper, count = None, 0
+        candidates = (
+            ClickEvent.objects.filter(id__gt=last)
+            .order_by("id")
+            .values_list("id", "timestamp")[:max_events]
+        )
+        for event_id, timestamp in candidates:
+            if timestamp >= cutoff:
+                break
+            upper, count = event_id, count + 1
+        if upper is None:
+            return 0
+
+        events = ClickEvent.objects.filter(id__gt=last, id__lte=upper)
+        hourly = (
+            events.annotate(b=TruncHour("timestamp"))
+            .values("short_key", "b")
+            .annotate(n=Count("id"))
+        )
+        daily = (
+            events.annotate(b=TruncDate("timestamp"))
+            .values("short_key", "b")
+            .annotate(n=Count("id"))
+        )
+        _merge(HourlyClickRollup, {(r["short_key"], r["b"]): r["n"] for r in hourly})
+        _merge(DailyClickRollup, {(r["short_key"], r["b"]): r["n"] for r in daily})
+
+        checkpoint.last_event_id = upper
+        checkpoint.save(update_fields=["last_event_id"])
+    return count
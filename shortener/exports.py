@@ -0,0 +1,72 @@
+"""
+Streaming CSV/JSONL export of short URLs.
+
+Rows are read through a server-side cursor (``.iterator()``) and encoded as
+they arrive, so memory stays flat for any account size and the CSV header
+is sent before the query even runs. Used by the export view and by
+``manage.py export_urls``.
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+FIELDS = ("short_key", "original_url", "clicks", "created_at", "expires_at")
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+# Rows encoded per yielded chunk; one tiny chunk per row is slow to send
+ROWS_PER_CHUNK = 500
+
+
+class _Echo:
+    """File-like object whose write() just returns the line for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _encode_csv(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_value(row[c]) for c in columns])
+
+
+def _encode_jsonl(rows, columns):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode({c: row[c] for c in columns}) + "\n"
+
+
+def export_rows(queryset, fmt, short_url=None, chunk_size=2000):
+    """Yield ``queryset`` as CSV or JSONL text in chunks.
+
+    ``short_url`` maps a short key to its public URL and adds a "short_url"
+    column when given.
+    """
+    def rows():
+        for row in queryset.values(*FIELDS).order_by("id").iterator(chunk_size=chunk_size):
+            if short_url:
+                row["short_url"] = short_url(row["short_key"])
+            yield row
+
+    columns = FIELDS + ("short_url",) if short_url else FIELDS
+    encode = _encode_csv if fmt == "csv" else _encode_jsonl
+    started = False
+    buffer = []
+    for line in encode(rows(), columns):
+        buffer.append(line)
+        # Send the first line at once so the download starts immediately
+        if len(buffer) >= ROWS_PER_CHUNK or not started:
+            yield "".join(buffer)
+            buffer = []
+            started = True
+    if buffer:
+        yield "".join(buffer)
@@ -0,0 +1,155 @@
+"""
+Collision-free short key generation.
+
+Each worker reserves blocks of sequence ids from the database in a single
+round trip and mints keys locally by base62-encoding them, so creating a
+link never needs a uniqueness query or a retry.
+
+Minted keys are always KEY_LENGTH (7) characters long, which keeps them
+disjoint from the 6-character random keys issued before this allocator
+existed. With SHORT_KEY_PERMUTE the ids are scrambled through a bijection
+first so consecutive links don't get guessable, consecutive keys.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections
+
+from .models import KeySequence
+from .utils import BASE62
+
+KEY_LENGTH = 7
+KEY_OFFSET = 62 ** (KEY_LENGTH - 1)
+KEY_SPACE = 62 ** KEY_LENGTH - KEY_OFFSET
+
+# Must stay coprime with KEY_SPACE (2**6 * 31**6 * 61) to remain a bijection
+PERMUTE_MULTIPLIER = 2141373045755  # ~ KEY_SPACE / golden ratio
+
+# Ids handed out per reservation; matches the Postgres sequence increment
+BLOCK_SIZE = 1000
+SEQUENCE_NAME = "shortener_short_key_seq"
+
+
+def encode(n):
+    digits = []
+    while n:
+        n, rem = divmod(n, 62)
+        digits.append(BASE62[rem])
+    return "".join(reversed(digits)) or BASE62[0]
+
+
+def key_for_id(n):
+    """Map a sequence id to its short key"""
+    if n >= KEY_SPACE:
+        raise OverflowError("short key space exhausted")
+    if settings.SHORT_KEY_PERMUTE:
+        n = (n * PERMUTE_MULTIPLIER + settings.SHORT_KEY_SALT) % KEY_SPACE
+    return encode(KEY_OFFSET + n)
+
+
+def is_reserved(key):
+    """True if ``key`` lies in the namespace the allocator mints from"""
+    return len(key) == KEY_LENGTH and key[0] != BASE62[0] and all(c in BASE62 for c in key)
+
+
+def _bump_key_sequence(conn, amount):
+    table = conn.ops.quote_name(KeySequence._meta.db_table)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET next_value = next_value + %s WHERE name = %s RETURNING next_value",
+            [amount, "short_key"],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {table} (name, next_value) VALUES (%s, 0)", ["short_key"])
+        except IntegrityError:
+            pass  # created concurrently
+        return _bump_key_sequence(conn, amount)
+    return row[0]
+
+
+def reserve_blocks(count):
+    """Reserve ``count`` blocks in one round trip; returns their start ids.
+
+    On Postgres this uses a sequence, which is never rolled back, so a
+    reservation made inside a transaction that later aborts is still safe.
+    Elsewhere a KeySequence row is bumped instead, committed on its own:
+    inside a caller's transaction that happens on a separate connection,
+    since a rollback rewinding the counter would hand the same ids to the
+    next worker. SQLite can't do that (the caller may hold the database's
+    write lock), see reserve_in_transaction().
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s)",
+                [SEQUENCE_NAME, count],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    if connection.in_atomic_block and connection.vendor != "sqlite":
+        own = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            end = _bump_key_sequence(own, count * BLOCK_SIZE)
+        finally:
+            own.close()
+    else:
+        end = _bump_key_sequence(connection, count * BLOCK_SIZE)
+    return list(range(end - count * BLOCK_SIZE, end, BLOCK_SIZE))
+
+
+def reserve_in_transaction(count):
+    """Reserve exactly ``count`` ids within the caller's SQLite transaction.
+
+    A rollback rewinds the counter, but it also drops every row that used
+    these ids, so nothing is handed out twice as long as none is cached for
+    later (or used after the transaction).
+    """
+    end = _bump_key_sequence(connection, count)
+    return list(range(end - count, end))
+
+
+class KeyAllocator:
+    """Hands out keys from per-process blocks of reserved ids"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._blocks = []
+
+    def next_ids(self, count):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Never share a block with the parent of a forked worker
+                self._pid = os.getpid()
+                self._blocks = []
+            available = sum(end - start for start, end in self._blocks)
+            extra = []
+            if available < count:
+                if connection.vendor == "sqlite" and connection.in_atomic_block:
+                    extra = reserve_in_transaction(count - available)
+                else:
+                    needed = -(-(count - available) // BLOCK_SIZE)
+                    self._blocks.extend((s, s + BLOCK_SIZE) for s in reserve_blocks(needed))
+            ids, wanted = [], count - len(extra)
+            while len(ids) < wanted:
+                start, end = self._blocks[0]
+                take = min(end - start, wanted - len(ids))
+                ids.extend(range(start, start + take))
+                if start + take == end:
+                    self._blocks.pop(0)
+                else:
+                    self._blocks[0] = (start + take, end)
+            return ids + extra
+
+    def next_keys(self, count):
+        return [key_for_id(n) for n in self.next_ids(count)]
+
+    def next_key(self):
+        return self.next_keys(1)[0]
+
+
+allocator = KeyAllocator()
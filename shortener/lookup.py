@@ -0,0 +1,190 @@
+"""
+Read-through cache for resolving a short key to its ShortURL.
+
+Lookups go through a bounded in-process LRU first, then the Bloom filter of
+known keys (bloom.py), then the shared Django cache, and only hit the
+database on a miss in all of them. Unknown keys are cached
+too (for SHORTURL_NEGATIVE_CACHE_TIMEOUT) so repeated misses stay cheap.
+Entries are invalidated from model signals (see signals.py).
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, close_old_connections
+from django.utils import timezone
+
+from . import routers
+from .bloom import key_filter
+from .models import ShortURL
+
+CACHE_KEY_PREFIX = "shorturl:v3:"
+
+# Stored in place of an entry when the key does not exist
+MISSING = "__missing__"
+
+# Columns kept in each cache entry
+FIELDS = ("id", "original_url", "expires_at", "redirect_type", "cache_max_age")
+
+_SAFE_KEY = re.compile(r"^[A-Za-z0-9_-]{1,20}$")
+
+# Where lookups were answered; read by metrics.py. Plain increments, so
+# counts are approximate under heavy thread contention.
+stats = {"local_hits": 0, "shared_hits": 0, "bloom_rejects": 0, "db_loads": 0}
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU whose entries expire after a TTL"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+local_cache = LRUCache(settings.SHORTURL_LRU_SIZE, settings.SHORTURL_LRU_TTL)
+
+
+def cache_key(code):
+    # Codes come straight from the URL path; hash anything that is not a
+    # plain key so the shared cache never sees unsafe characters.
+    if _SAFE_KEY.match(code):
+        return CACHE_KEY_PREFIX + code
+    return CACHE_KEY_PREFIX + "h:" + hashlib.sha1(code.encode()).hexdigest()
+
+
+def recent_key(code):
+    """Marks a key changed in the last DB_REPLICA_PIN_SECONDS (see invalidate)"""
+    return "recent:" + cache_key(code)
+
+
+def load(code):
+    """Fetch the cacheable fields for a short key straight from the database.
+
+    Returns ``(row or None, from_replica)``. Keys changed moments ago are
+    read from the primary, since the replica may still hold the old row.
+    """
+    queryset = ShortURL.objects.filter(short_key=code).values(*FIELDS)
+    replica = routers.reading_from_replica() and cache.get(recent_key(code)) is None
+    rows = list(queryset[:1] if replica else queryset.using(DEFAULT_DB_ALIAS)[:1])
+    if not rows and replica and settings.DB_REPLICA_FALLBACK_ON_MISS:
+        # The key may be too new for a lagging replica
+        rows = list(queryset.using(DEFAULT_DB_ALIAS)[:1])
+        replica = False
+    return (rows[0] if rows else None), replica
+
+
+def _shared_timeout(entry, from_replica=False):
+    if entry == MISSING:
+        timeout = settings.SHORTURL_NEGATIVE_CACHE_TIMEOUT
+    else:
+        timeout = settings.SHORTURL_CACHE_TIMEOUT
+    if from_replica:
+        # A lagging replica may have served a stale row; don't keep it long
+        timeout = min(timeout, settings.SHORTURL_REPLICA_CACHE_TIMEOUT)
+    return timeout
+
+
+def _local_ttl(entry):
+    if entry == MISSING:
+        return min(settings.SHORTURL_LRU_TTL, settings.SHORTURL_NEGATIVE_CACHE_TIMEOUT)
+    return None
+
+
+def resolve(code):
+    """Return a dict of FIELDS for the short key, or None if it doesn't exist"""
+    key = cache_key(code)
+    entry = local_cache.get(key)
+    if entry is None:
+        if not key_filter.might_exist(code):
+            stats["bloom_rejects"] += 1
+            return None
+        entry = cache.get(key)
+        if entry is None:
+            stats["db_loads"] += 1
+            row, from_replica = load(code)
+            entry = row or MISSING
+            cache.set(key, entry, _shared_timeout(entry, from_replica))
+        else:
+            stats["shared_hits"] += 1
+        local_cache.set(key, entry, _local_ttl(entry))
+    else:
+        stats["local_hits"] += 1
+    return None if entry == MISSING else entry
+
+
+def _resolve_in_thread(code):
+    try:
+        return resolve(code)
+    finally:
+        # What request_finished does for sync views: honour CONN_MAX_AGE
+        close_old_connections()
+
+
+async def aresolve(code):
+    """Async resolve(): LRU hits are answered on the event loop.
+
+    Misses run resolve() with thread_sensitive=False, so concurrent misses
+    each get a thread of their own instead of queueing on the one thread
+    Django's async cache and ORM APIs share.
+    """
+    entry = local_cache.get(cache_key(code))
+    if entry is None:
+        return await sync_to_async(_resolve_in_thread, thread_sensitive=False)(code)
+    stats["local_hits"] += 1
+    return None if entry == MISSING else entry
+
+
+def is_expired(entry):
+    expires_at = entry["expires_at"]
+    return expires_at is not None and expires_at <= timezone.now()
+
+
+def invalidate(*codes):
+    """Drop cached entries (positive or negative) for the given short keys"""
+    codes = [code for code in codes if code]
+    keys = [cache_key(code) for code in codes]
+    for key in keys:
+        local_cache.delete(key)
+    if keys:
+        cache.delete_many(keys)
+        if routers.replica_configured() and settings.DB_REPLICA_PIN_SECONDS:
+            # Until the replica has caught up, reload these from the primary
+            cache.set_many({recent_key(code): 1 for code in codes}, settings.DB_REPLICA_PIN_SECONDS)
@@ -0,0 +1,231 @@
+"""
+Email outbox.
+
+With ``EMAIL_BACKEND = "shortener.mail.OutboxBackend"`` every ``send_mail()``
+(OTP codes, allauth confirmations, ...) just inserts an EmailOutbox row, so
+the request never waits on an SMTP handshake. ``send_due()`` delivers queued
+rows through the real backend (EMAIL_DELIVERY_BACKEND) over one connection per
+batch, retrying failures with exponential backoff until
+EMAIL_OUTBOX_MAX_ATTEMPTS.
+
+Rows are delivered by ``manage.py send_queued_mail`` and, unless
+EMAIL_OUTBOX_SEND_IN_PROCESS is off, by a background thread in the web
+process that is woken as soon as the enqueuing transaction commits. A
+delivered row keeps only its headers (the body may hold an OTP), and
+``manage.py purge_outbox`` deletes sent and failed rows after
+EMAIL_OUTBOX_RETENTION_DAYS.
+``LatencyBackend`` simulates a slow SMTP server for measuring throughput.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+from .utils import BackgroundFlusher
+
+stats = {"queued": 0, "sent": 0, "retried": 0, "failed": 0}
+
+
+def serialize(message):
+    """JSON-safe copy of an EmailMessage (attachments are not supported)"""
+    return {
+        "subject": message.subject,
+        "body": message.body,
+        "from_email": message.from_email,
+        "to": list(message.to),
+        "cc": list(message.cc),
+        "bcc": list(message.bcc),
+        "reply_to": list(message.reply_to),
+        "headers": dict(message.extra_headers),
+        "content_subtype": message.content_subtype,
+        "alternatives": [list(alt) for alt in getattr(message, "alternatives", [])],
+    }
+
+
+def deserialize(payload):
+    message = EmailMultiAlternatives(
+        subject=payload["subject"],
+        body=payload["body"],
+        from_email=payload["from_email"],
+        to=payload["to"],
+        cc=payload["cc"],
+        bcc=payload["bcc"],
+        reply_to=payload["reply_to"],
+        headers=payload["headers"],
+        alternatives=[tuple(alt) for alt in payload["alternatives"]],
+    )
+    message.content_subtype = payload["content_subtype"]
+    return message
+
+
+def enqueue(messages):
+    """Store ``messages`` in the outbox; returns how many were queued"""
+    rows = [
+        EmailOutbox(
+            subject=message.subject[:998],
+            recipients=", ".join(message.recipients()),
+            payload=serialize(message),
+        )
+        for message in messages
+        if message.recipients()
+    ]
+    if not rows:
+        return 0
+    EmailOutbox.objects.bulk_create(rows)
+    stats["queued"] += len(rows)
+    if settings.EMAIL_OUTBOX_SEND_IN_PROCESS:
+        sender.ensure_started()
+        transaction.on_commit(sender.poke)
+    return len(rows)
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim_due(batch_size):
+    """Lease up to ``batch_size`` due rows to this sender and return them.
+
+    Rows are picked with SELECT ... FOR UPDATE SKIP LOCKED and pushed
+    EMAIL_OUTBOX_CLAIM_TIMEOUT seconds into the future in the same short
+    transaction, so other senders skip them while they are delivered and
+    pick them up again if this sender dies mid-batch.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        rows = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailOutbox.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if rows:
+            EmailOutbox.objects.filter(id__in=[row.id for row in rows]).update(
+                next_attempt_at=now + timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT)
+            )
+    return rows
+
+
+def send_due(connection=None, batch_size=None):
+    """Deliver one batch of due messages; returns how many rows were claimed.
+
+    Rows are claimed in their own transaction (see claim_due), so no
+    database locks are held while talking to the mail server. Pass a
+    ``connection`` to reuse it across batches; otherwise one is opened
+    for this batch and closed afterwards.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    rows = claim_due(batch_size)
+    if not rows:
+        return 0
+    own_connection = connection is None
+    if own_connection:
+        connection = get_connection(settings.EMAIL_DELIVERY_BACKEND)
+
+    try:
+        for row in rows:
+            row.attempts += 1
+            try:
+                # No-op while open; backends only keep a connection they
+                # didn't open themselves across send_messages() calls
+                connection.open()
+                connection.send_messages([deserialize(row.payload)])
+            except Exception as exc:
+                # Drop a possibly broken connection; the next send reopens it
+                connection.close()
+                row.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+                if row.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                    row.status = EmailOutbox.FAILED
+                    stats["failed"] += 1
+                else:
+                    row.next_attempt_at = timezone.now() + retry_delay(row.attempts)
+                    stats["retried"] += 1
+            else:
+                row.status = EmailOutbox.SENT
+                row.sent_at = timezone.now()
+                row.last_error = ""
+                # The body may hold a one-time code; keep only the headers
+                row.payload = {}
+                stats["sent"] += 1
+    finally:
+        if own_connection:
+            connection.close()
+        EmailOutbox.objects.bulk_update(
+            rows, ["status", "attempts", "next_attempt_at", "last_error", "sent_at", "payload"]
+        )
+    return len(rows)
+
+
+def purgeable(older_than=None):
+    """Sent and failed rows created before ``older_than`` (default: the retention period)"""
+    if older_than is None:
+        older_than = timezone.now() - timedelta(days=settings.EMAIL_OUTBOX_RETENTION_DAYS)
+    return EmailOutbox.objects.filter(
+        status__in=(EmailOutbox.SENT, EmailOutbox.FAILED), created_at__lt=older_than
+    )
+
+
+def drain():
+    """Send batches until nothing more is due"""
+    connection = get_connection(settings.EMAIL_DELIVERY_BACKEND)
+    try:
+        while send_due(connection) >= settings.EMAIL_OUTBOX_BATCH_SIZE:
+            pass
+    finally:
+        connection.close()
+
+
+sender = BackgroundFlusher("email-outbox", drain, settings.EMAIL_OUTBOX_POLL_INTERVAL)
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Queue messages in EmailOutbox instead of sending them"""
+
+    def send_messages(self, email_messages):
+        queued = [m for m in email_messages if not m.attachments]
+        direct = [m for m in email_messages if m.attachments]
+        count = enqueue(queued)
+        if direct:
+            # Attachments aren't JSON-serializable; deliver those inline
+            connection = get_connection(
+                settings.EMAIL_DELIVERY_BACKEND, fail_silently=self.fail_silently
+            )
+            count += connection.send_messages(direct) or 0
+        return count
+
+
+class LatencyBackend(LocmemBackend):
+    """locmem backend that sleeps like an SMTP server.
+
+    Opening a connection costs EMAIL_LATENCY_CONNECT seconds and each message
+    EMAIL_LATENCY_PER_MESSAGE, which makes the benefit of reusing connections
+    across a batch measurable without a mail server.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connected = False
+
+    def open(self):
+        if self.connected:
+            return False
+        time.sleep(settings.EMAIL_LATENCY_CONNECT)
+        self.connected = True
+        return True
+
+    def close(self):
+        self.connected = False
+
+    def send_messages(self, messages):
+        new_connection = self.open()
+        try:
+            time.sleep(settings.EMAIL_LATENCY_PER_MESSAGE * len(messages))
+            return super().send_messages(messages)
+        finally:
+            if new_connection:
+                self.close()
@@ -0,0 +1,292 @@
+import json
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from shortener.keys import allocator
+from shortener.models import ShortURL
+from shortener.signals import short_urls_created
+from shortener.utils import url_hash
+
+USER_PREFIX = "bench_user_"
+PASSWORD = "bench-password"
+SCENARIOS = ("redirect", "create", "list", "dashboard", "qr")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class ZipfSampler:
+    """Draws items with probability proportional to 1 / rank ** s"""
+
+    def __init__(self, items, s, rng):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(accumulate(1 / (rank ** s) for rank in range(1, len(self.items) + 1)))
+
+    def sample(self, rng):
+        return rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+
+class InProcessDriver:
+    """Sends requests through django.test.Client, one client per thread"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _client(self, user):
+        clients = getattr(self._local, "clients", None)
+        if clients is None:
+            clients = self._local.clients = {}
+        if user.pk not in clients:
+            client = Client()
+            client.force_login(user)
+            clients[user.pk] = client
+        return clients[user.pk]
+
+    def token(self, user):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        return str(RefreshToken.for_user(user).access_token)
+
+    def request(self, method, path, user, token=None, json_body=None):
+        client = self._client(user)
+        extra = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+        if method == "POST":
+            response = client.post(path, json.dumps(json_body), content_type="application/json", **extra)
+        else:
+            response = client.get(path, **extra)
+        return response.status_code
+
+
+class HTTPDriver:
+    """Sends requests to a running server with `requests`, one session per thread"""
+
+    def __init__(self, base_url):
+        import requests
+        self.requests = requests
+        self.base_url = base_url.rstrip("/")
+        self._local = threading.local()
+
+    def _session(self, user):
+        sessions = getattr(self._local, "sessions", None)
+        if sessions is None:
+            sessions = self._local.sessions = {}
+        if user.pk not in sessions:
+            session = self.requests.Session()
+            session.get(f"{self.base_url}/login/")
+            session.post(f"{self.base_url}/login/", data={
+                "username": user.username,
+                "password": PASSWORD,
+                "csrfmiddlewaretoken": session.cookies.get("csrftoken", ""),
+            }, headers={"Referer": f"{self.base_url}/login/"}, allow_redirects=False)
+            sessions[user.pk] = session
+        return sessions[user.pk]
+
+    def token(self, user):
+        response = self.requests.post(
+            f"{self.base_url}/api/token/",
+            json={"username": user.username, "password": PASSWORD},
+        )
+        response.raise_for_status()
+        return response.json()["access"]
+
+    def request(self, method, path, user, token=None, json_body=None):
+        session = self._session(user)
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = session.request(
+            method, self.base_url + path, json=json_body, headers=headers, allow_redirects=False,
+        )
+        return response.status_code
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed benchmark users/links and measure throughput and latency of the "
+        "redirect, create, list, dashboard and QR paths. Prints JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--links", type=int, default=10000, help="Links per run (spread over users)")
+        parser.add_argument("--reseed", action="store_true", help="Drop and recreate benchmark data")
+        parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--zipf", type=float, default=1.1, help="Key popularity skew (0 = uniform)")
+        parser.add_argument("--warmup", type=int, default=100, help="Unmeasured requests per scenario")
+        parser.add_argument("--base-url", help="Benchmark a running server instead of in-process")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--label", default="", help="Free-form tag stored in the report (e.g. branch)")
+        parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+        parser.add_argument("--force", action="store_true", help="Allow running with DEBUG=False")
+        parser.add_argument(
+            "--ratelimit", action="store_true",
+            help="Keep rate limiting on for in-process runs (off by default, or every client shares one IP)",
+        )
+
+    def handle(self, *args, **options):
+        if not options["base_url"] and not options["ratelimit"]:
+            # Every test-client request comes from 127.0.0.1, so they would
+            # all share one bucket and the run would measure 429s
+            with override_settings(RATELIMIT_ENABLED=False):
+                return self.benchmark(options)
+        return self.benchmark(options)
+
+    def benchmark(self, options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("Refusing to seed benchmark data with DEBUG=False; pass --force")
+        scenarios = [s.strip() for s in options["scenarios"].split(",") if s.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        rng = random.Random(options["seed"])
+        users = self.seed(options["users"], options["links"], options["reseed"])
+        links = list(ShortURL.objects.filter(user__in=users).values_list("id", "short_key", "user_id"))
+        if not links:
+            raise CommandError("No benchmark links found")
+        sampler = ZipfSampler(links, options["zipf"], rng)
+        users_by_id = {u.pk: u for u in users}
+
+        driver = HTTPDriver(options["base_url"]) if options["base_url"] else InProcessDriver()
+        tokens = {u.pk: driver.token(u) for u in users}
+
+        def make_request(scenario, i):
+            local_rng = random.Random(options["seed"] * 1000003 + i)
+            link_id, short_key, user_id = sampler.sample(local_rng)
+            user = users_by_id[user_id]
+            if scenario == "redirect":
+                return driver.request("GET", f"/{short_key}/", user), (302,)
+            if scenario == "create":
+                body = {"url": f"https://bench.example.com/created/{i}"}
+                return driver.request("POST", "/api/urls/", user, tokens[user.pk], body), (201,)
+            if scenario == "list":
+                return driver.request("GET", "/api/urls/?page_size=100", user, tokens[user.pk]), (200,)
+            if scenario == "dashboard":
+                return driver.request("GET", "/dashboard/", user), (200,)
+            return driver.request("GET", f"/qr/{link_id}/download/", user), (200, 304)
+
+        report = {
+            "label": options["label"],
+            "timestamp": timezone.now().isoformat(),
+            "git_commit": self.git_commit(),
+            "target": options["base_url"] or "in-process",
+            "database": connection.vendor,
+            "config": {
+                k: options[k] for k in ("users", "links", "requests", "concurrency", "zipf", "warmup", "seed")
+            },
+            "scenarios": {},
+        }
+        for scenario in scenarios:
+            self.stderr.write(f"Running {scenario}...")
+            report["scenarios"][scenario] = self.run_scenario(
+                scenario, make_request, options["requests"], options["warmup"], options["concurrency"],
+            )
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output + "\n")
+
+    def seed(self, num_users, num_links, reseed):
+        existing = User.objects.filter(username__startswith=USER_PREFIX)
+        if reseed:
+            existing.delete()
+        elif existing.count() >= num_users:
+            return list(existing.order_by("id")[:num_users])
+
+        password = make_password(PASSWORD)  # hash once, reuse for every user
+        User.objects.bulk_create(
+            [User(username=f"{USER_PREFIX}{i}", password=password) for i in range(num_users)],
+            ignore_conflicts=True,
+        )
+        users = list(User.objects.filter(username__startswith=USER_PREFIX).order_by("id")[:num_users])
+
+        self.stderr.write(f"Seeding {num_links} links for {len(users)} users...")
+        batch_size = 5000
+        for start in range(0, num_links, batch_size):
+            count = min(batch_size, num_links - start)
+            rows = [
+                ShortURL(
+                    user=users[(start + i) % len(users)],
+                    original_url=f"https://bench.example.com/page/{start + i}",
+                    url_hash=url_hash(f"https://bench.example.com/page/{start + i}"),
+                    short_key=key,
+                )
+                for i, key in enumerate(allocator.next_keys(count))
+            ]
+            ShortURL.objects.bulk_create(rows)
+            short_urls_created.send(sender=ShortURL, short_keys=[r.short_key for r in rows])
+        return users
+
+    def run_scenario(self, scenario, make_request, num_requests, warmup, concurrency):
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker(indexes, measure):
+            close_old_connections()
+            for i in indexes:
+                started = time.perf_counter()
+                try:
+                    status, expected = make_request(scenario, i)
+                    ok = status in expected
+                except Exception as exc:  # keep the run going; report it
+                    status, ok = repr(exc), False
+                elapsed = time.perf_counter() - started
+                if measure:
+                    with lock:
+                        latencies.append(elapsed)
+                        if not ok:
+                            errors.append(status)
+            close_old_connections()
+
+        def run(indexes, measure):
+            shards = [indexes[n::concurrency] for n in range(concurrency)]
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(lambda shard: worker(shard, measure), shards))
+
+        run(list(range(-warmup, 0)), measure=False)
+        started = time.perf_counter()
+        run(list(range(num_requests)), measure=True)
+        duration = time.perf_counter() - started
+
+        latencies.sort()
+        ms = lambda v: None if v is None else round(v * 1000, 3)  # noqa: E731
+        return {
+            "requests": len(latencies),
+            "errors": len(errors),
+            "error_samples": [str(e) for e in errors[:5]],
+            "duration_s": round(duration, 3),
+            "throughput_rps": round(len(latencies) / duration, 1) if duration else None,
+            "p50_ms": ms(percentile(latencies, 50)),
+            "p95_ms": ms(percentile(latencies, 95)),
+            "p99_ms": ms(percentile(latencies, 99)),
+            "max_ms": ms(latencies[-1] if latencies else None),
+        }
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True, text=True, cwd=settings.BASE_DIR, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
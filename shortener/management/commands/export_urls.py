@@ -0,0 +1,46 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from shortener import exports
+from shortener.models import ShortURL
+
+
+class Command(BaseCommand):
+    help = "Stream a user's short URLs and click totals as CSV or JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to export (default: every user)")
+        parser.add_argument("--format", choices=sorted(exports.FORMATS), default="csv")
+        parser.add_argument("--output", "-o", help="Write here instead of stdout")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched per database round trip")
+        parser.add_argument(
+            "--base-url", help="Add a short_url column, e.g. https://shortify.app",
+        )
+
+    def handle(self, *args, **options):
+        urls = ShortURL.objects.all()
+        if options["user"]:
+            try:
+                urls = urls.filter(user=User.objects.get(username=options["user"]))
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['user']!r}")
+
+        short_url = None
+        if options["base_url"]:
+            base_url = options["base_url"].rstrip("/")
+            short_url = lambda key: f"{base_url}/{key}/"  # noqa: E731
+
+        out = open(options["output"], "w", newline="", encoding="utf-8") if options["output"] else sys.stdout
+        rows = 0
+        try:
+            for chunk in exports.export_rows(urls, options["format"], short_url, options["chunk_size"]):
+                out.write(chunk)
+                rows += chunk.count("\n")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if options["format"] == "csv":
+            rows -= 1  # header
+        self.stderr.write(self.style.SUCCESS(f"Exported {rows} short URLs"))
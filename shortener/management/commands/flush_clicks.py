@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from shortener import clicks
+
+
+class Command(BaseCommand):
+    help = "Write buffered click counts to the database (run on deploy/shutdown)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--include-open",
+            action="store_true",
+            help="Also take the counts of windows still receiving clicks (cache buffer)",
+        )
+
+    def handle(self, *args, **options):
+        clicks.flush(include_open=options["include_open"])
+        self.stdout.write(self.style.SUCCESS(
+            "Flushed {clicks} clicks across {rows} links in {flushes} batches".format(**clicks.stats)
+        ))
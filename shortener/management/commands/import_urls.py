@@ -0,0 +1,268 @@
+import csv
+import io
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from shortener.bulk import check_custom_key, clean_item
+from shortener.keys import allocator, is_reserved
+from shortener.models import ShortURL
+from shortener.signals import short_urls_created
+
+FORMATS = ("csv", "jsonl")
+CONFLICT_POLICIES = ("skip", "rekey", "error")
+COPY_COLUMNS = (
+    "user_id", "original_url", "short_key", "clicks", "created_at", "expires_at", "url_hash",
+    "redirect_type", "cache_max_age",
+)
+
+
+def read_csv(fh):
+    for row in csv.DictReader(fh):
+        yield {k.strip(): (v or "").strip() for k, v in row.items() if k}
+
+
+def read_jsonl(fh):
+    for line in fh:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield ValueError("Invalid JSON")
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream short URLs from CSV or JSONL (a file or '-' for stdin) into the "
+        "database in batches. Columns/keys: url, short_key, expires_at, clicks, username."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Path to the input file, or - for stdin")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension")
+        parser.add_argument("--user", help="Owner for rows without a username column")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--on-conflict", choices=CONFLICT_POLICIES, default="skip",
+            help="What to do with a short_key that already exists or lies in the "
+                 "generated key space: skip the row, give it a generated key, or stop",
+        )
+        parser.add_argument("--rejects", help="Write rejected and skipped rows here as JSONL")
+        parser.add_argument("--checkpoint", help="Record progress here after every batch")
+        parser.add_argument("--resume", action="store_true", help="Skip rows the checkpoint marks as done")
+        parser.add_argument("--copy", action="store_true", help="Insert with COPY (PostgreSQL + psycopg2)")
+        parser.add_argument("--dry-run", action="store_true", help="Validate and check conflicts only")
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        fmt = options["format"] or os.path.splitext(source)[1].lstrip(".").lower()
+        if fmt == "ndjson":
+            fmt = "jsonl"
+        if fmt not in FORMATS:
+            raise CommandError("Can't tell the input format; pass --format csv or --format jsonl")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        self.options = options
+        self.default_user_id = None
+        if options["user"]:
+            try:
+                self.default_user_id = User.objects.get(username=options["user"]).pk
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['user']!r}")
+        self.user_ids = {}
+        self.use_copy = options["copy"] and self.copy_available()
+        if options["copy"] and not self.use_copy:
+            self.stderr.write("COPY needs PostgreSQL with psycopg2; falling back to bulk_create")
+
+        self.counts = {"records": 0, "imported": 0, "skipped": 0, "rejected": 0}
+        if options["resume"]:
+            if not options["checkpoint"]:
+                raise CommandError("--resume needs --checkpoint")
+            self.load_checkpoint()
+        done = self.start_records = self.counts["records"]
+
+        rejects = open(options["rejects"], "a") if options["rejects"] else None
+        fh = sys.stdin if source == "-" else open(source, newline="", encoding="utf-8")
+        started = time.monotonic()
+        try:
+            reader = read_csv(fh) if fmt == "csv" else read_jsonl(fh)
+            records = islice(enumerate(reader, start=1), done, None)
+            while True:
+                batch = list(islice(records, options["batch_size"]))
+                if not batch:
+                    break
+                self.import_batch(batch, rejects)
+                self.counts["records"] = batch[-1][0]
+                if options["checkpoint"] and not options["dry_run"]:
+                    self.save_checkpoint()
+                self.report(started)
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+            if rejects:
+                rejects.close()
+
+        verb = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            "{verb} {imported} short URLs ({skipped} skipped, {rejected} rejected) "
+            "from {records} rows".format(verb=verb, **self.counts)
+        ))
+
+    def owner_id(self, raw):
+        username = raw.get("username") if isinstance(raw, dict) else None
+        if not username:
+            return self.default_user_id
+        if username not in self.user_ids:
+            self.user_ids[username] = (
+                User.objects.filter(username=username).values_list("pk", flat=True).first()
+            )
+        return self.user_ids[username]
+
+    def clean(self, raw):
+        """Return (ShortURL, None) or (None, error) for one input record"""
+        if isinstance(raw, Exception):
+            return None, str(raw)
+        fields, error = clean_item(raw)
+        if error:
+            return None, error
+        user_id = self.owner_id(raw)
+        if user_id is None:
+            return None, "Unknown owner; set --user or a valid username"
+        key = raw.get("short_key") if isinstance(raw, dict) else None
+        key = str(key).strip() if key else None
+        if key:
+            error = check_custom_key(key)
+            if error:
+                return None, error
+        try:
+            clicks = int((raw.get("clicks") if isinstance(raw, dict) else 0) or 0)
+        except (TypeError, ValueError):
+            return None, "'clicks' must be an integer"
+        if clicks < 0:
+            return None, "'clicks' must not be negative"
+        return ShortURL(user_id=user_id, short_key=key, clicks=clicks, **fields), None
+
+    def resolve_conflicts(self, entries, reject):
+        """Drop or re-key rows whose short_key is taken; returns the entries to insert"""
+        provided = [row.short_key for _, _, row in entries if row.short_key]
+        taken = set(ShortURL.objects.filter(short_key__in=provided).values_list("short_key", flat=True))
+        kept = []
+        for number, raw, row in entries:
+            conflict = None
+            if row.short_key in taken:
+                conflict = "already exists"
+            elif row.short_key and is_reserved(row.short_key):
+                # The allocator could mint this key later, so it can't be kept
+                conflict = "lies in the generated key space"
+            if conflict:
+                policy = self.options["on_conflict"]
+                if policy == "error":
+                    raise CommandError(f"Row {number}: short key {row.short_key!r} {conflict}")
+                if policy == "skip":
+                    reject(number, raw, f"Short key {row.short_key!r} {conflict}", skipped=True)
+                    continue
+                row.short_key = None
+            if row.short_key:
+                taken.add(row.short_key)  # later duplicates in this batch conflict too
+            kept.append((number, raw, row))
+        return kept
+
+    def import_batch(self, batch, rejects):
+        def reject(number, raw, error, skipped=False):
+            self.counts["skipped" if skipped else "rejected"] += 1
+            if rejects:
+                if isinstance(raw, Exception):
+                    raw = None
+                rejects.write(json.dumps({"row": number, "error": error, "data": raw}) + "\n")
+
+        entries = []
+        for number, raw in batch:
+            row, error = self.clean(raw)
+            if error:
+                reject(number, raw, error)
+            else:
+                entries.append((number, raw, row))
+
+        for attempt in range(2):
+            entries = self.resolve_conflicts(entries, reject)
+            rows = [row for _, _, row in entries]
+            if self.options["dry_run"]:
+                self.counts["imported"] += len(rows)
+                return
+            missing = [row for row in rows if not row.short_key]
+            for row, key in zip(missing, allocator.next_keys(len(missing))):
+                row.short_key = key
+            try:
+                with transaction.atomic():
+                    if self.use_copy:
+                        self.copy_rows(rows)
+                    else:
+                        ShortURL.objects.bulk_create(rows)
+                break
+            except IntegrityError:
+                # A key was taken between the check and the insert; check again once
+                if attempt:
+                    raise
+                for row in missing:
+                    row.short_key = None
+
+        self.counts["imported"] += len(rows)
+        short_urls_created.send(sender=ShortURL, short_keys=[row.short_key for row in rows])
+
+    def copy_available(self):
+        if connection.vendor != "postgresql":
+            return False
+        with connection.cursor() as cursor:
+            return hasattr(cursor.cursor, "copy_expert")
+
+    def copy_rows(self, rows):
+        now = timezone.now().isoformat()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([
+                row.user_id, row.original_url, row.short_key, row.clicks, now,
+                row.expires_at.isoformat() if row.expires_at else "", row.url_hash,
+                row.redirect_type, "" if row.cache_max_age is None else row.cache_max_age,
+            ])
+        buffer.seek(0)
+        quote = connection.ops.quote_name
+        columns = ", ".join(quote(c) for c in COPY_COLUMNS)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f"COPY {quote(ShortURL._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer,
+            )
+
+    def load_checkpoint(self):
+        try:
+            with open(self.options["checkpoint"]) as fh:
+                saved = json.load(fh)
+        except FileNotFoundError:
+            return
+        if saved.get("source") != self.options["source"]:
+            raise CommandError(f"Checkpoint is for {saved.get('source')!r}, not {self.options['source']!r}")
+        self.counts.update(saved["counts"])
+        self.stderr.write(f"Resuming after row {self.counts['records']}")
+
+    def save_checkpoint(self):
+        path = self.options["checkpoint"]
+        with open(path + ".tmp", "w") as fh:
+            json.dump({"source": self.options["source"], "counts": self.counts}, fh)
+        os.replace(path + ".tmp", path)
+
+    def report(self, started):
+        elapsed = time.monotonic() - started
+        self.stderr.write(
+            "{records} rows read, {imported} imported, {skipped} skipped, {rejected} rejected".format(**self.counts)
+            + f" ({(self.counts['records'] - self.start_records) / elapsed if elapsed else 0:.0f} rows/s)"
+        )
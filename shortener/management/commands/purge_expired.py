@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from shortener.models import ArchivedShortURL, ShortURL
+
+ARCHIVE_FIELDS = ("id", "user_id", "original_url", "short_key", "clicks", "created_at", "expires_at")
+
+
+class Command(BaseCommand):
+    help = "Delete (or archive) expired short URLs in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--archive", action="store_true",
+            help="Copy rows into ArchivedShortURL before deleting them",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=0.1,
+            help="Seconds to pause between batches to let other writers in",
+        )
+        parser.add_argument("--max-batches", type=int, default=None)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        # Fixed cutoff so links expiring mid-run don't keep the loop going
+        cutoff = timezone.now()
+        expired = ShortURL.objects.filter(expires_at__lte=cutoff).order_by("expires_at")
+
+        if options["dry_run"]:
+            self.stdout.write(f"{expired.count()} expired short URLs")
+            return
+
+        total = batches = 0
+        while options["max_batches"] is None or batches < options["max_batches"]:
+            # Each batch is its own short transaction, locking only its rows
+            with transaction.atomic():
+                ids = list(expired.values_list("id", flat=True)[:options["batch_size"]])
+                if not ids:
+                    break
+                if options["archive"]:
+                    rows = ShortURL.objects.filter(id__in=ids).values(*ARCHIVE_FIELDS)
+                    ArchivedShortURL.objects.bulk_create(
+                        ArchivedShortURL(original_id=row.pop("id"), **row) for row in rows
+                    )
+                ShortURL.objects.filter(id__in=ids).delete()
+
+            total += len(ids)
+            batches += 1
+            self.stdout.write(f"Removed {total} expired short URLs")
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        action = "Archived" if options["archive"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{action} {total} expired short URLs"))
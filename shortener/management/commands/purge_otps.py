@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from shortener.models import OneTimeCode, PasswordResetOTP
+
+
+class Command(BaseCommand):
+    help = "Empty the legacy PasswordResetOTP table and drop expired OneTimeCode rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep", type=float, default=0.1,
+            help="Seconds to pause between batches to let other writers in",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        targets = [
+            ("legacy password reset OTPs", PasswordResetOTP.objects.order_by("id"), "id"),
+            ("expired one-time codes", OneTimeCode.objects.filter(expires_at__lte=timezone.now()), "key"),
+        ]
+        for label, queryset, pk in targets:
+            if options["dry_run"]:
+                self.stdout.write(f"{queryset.count()} {label}")
+                continue
+            total = 0
+            while True:
+                with transaction.atomic():
+                    ids = list(queryset.values_list(pk, flat=True)[:options["batch_size"]])
+                    if not ids:
+                        break
+                    queryset.model.objects.filter(**{f"{pk}__in": ids}).delete()
+                total += len(ids)
+                if options["sleep"]:
+                    time.sleep(options["sleep"])
+            self.stdout.write(self.style.SUCCESS(f"Deleted {total} {label}"))
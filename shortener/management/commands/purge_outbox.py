@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shortener import mail
+
+
+class Command(BaseCommand):
+    help = "Delete sent and failed EmailOutbox rows past the retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.EMAIL_OUTBOX_RETENTION_DAYS,
+            help="Keep rows created within this many days",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        rows = mail.purgeable(cutoff)
+        if options["dry_run"]:
+            self.stdout.write(f"{rows.count()} sent or failed outbox rows")
+            return
+        deleted, _ = rows.delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} sent or failed outbox rows"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from shortener import events
+
+
+class Command(BaseCommand):
+    help = "Fold new ClickEvent rows into the hourly and daily rollup tables (run from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=50000)
+        parser.add_argument(
+            "--lag", type=int, default=60,
+            help="Leave events younger than this many seconds for the next run",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            done = events.refresh_rollups(options["chunk_size"], options["lag"])
+            if not done:
+                break
+            total += done
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {total} click events"))
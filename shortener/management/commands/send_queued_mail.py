@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from shortener import mail
+from shortener.models import EmailOutbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued EmailOutbox messages over a reused mail connection"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help="Messages claimed per transaction",
+        )
+        parser.add_argument(
+            "--backend",
+            default=settings.EMAIL_DELIVERY_BACKEND,
+            help="Delivery backend, e.g. shortener.mail.LatencyBackend for a benchmark",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new mail instead of exiting once the outbox is drained",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.EMAIL_OUTBOX_POLL_INTERVAL,
+            help="Seconds between polls with --loop",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        connection = get_connection(options["backend"])
+        started = time.monotonic()
+        claimed = 0
+        try:
+            while True:
+                count = mail.send_due(connection, batch_size)
+                claimed += count
+                if count >= batch_size:
+                    continue
+                if not options["loop"]:
+                    break
+                # Don't hold an idle SMTP session open between polls
+                connection.close()
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+
+        elapsed = time.monotonic() - started
+        rate = claimed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            "Processed {claimed} messages in {elapsed:.2f}s ({rate:.1f}/s): "
+            "{sent} sent, {retried} to retry, {failed} failed; {pending} still pending".format(
+                claimed=claimed,
+                elapsed=elapsed,
+                rate=rate,
+                pending=EmailOutbox.objects.filter(status=EmailOutbox.PENDING).count(),
+                **mail.stats,
+            )
+        ))
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# What a fresh worker does before serving its first request
+STARTUP_SCRIPT = """
+import time
+started = time.perf_counter()
+import django
+django.setup()
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+print(time.perf_counter() - started)
+"""
+
+
+def parse_importtime(output):
+    """Yield (name, self_us, cumulative_us, depth) from ``-X importtime`` output"""
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        yield name.strip(), int(self_us), int(cumulative_us), depth
+
+
+class Command(BaseCommand):
+    help = "Time a cold worker start (django.setup + URLconf) and list the slowest imports"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=25, help="Rows to show")
+        parser.add_argument(
+            "--sort", choices=("cumulative", "self"), default="cumulative",
+            help="Rank by time including (cumulative) or excluding (self) sub-imports",
+        )
+        parser.add_argument(
+            "--top-level", action="store_true",
+            help="Only list modules imported directly rather than by another import",
+        )
+        parser.add_argument("--filter", default="", help="Only list modules starting with this prefix")
+        parser.add_argument("--raw", help="Also write the raw -X importtime output to this file")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "dev.settings")}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+            capture_output=True, text=True, env=env,
+        )
+        if result.returncode:
+            raise CommandError(f"Startup failed:\n{result.stderr[-2000:]}")
+        if options["raw"]:
+            with open(options["raw"], "w") as f:
+                f.write(result.stderr)
+
+        rows = list(parse_importtime(result.stderr))
+        total_us = sum(self_us for _, self_us, _, _ in rows)
+        shown = [
+            row for row in rows
+            if row[0].startswith(options["filter"]) and (row[3] == 0 or not options["top_level"])
+        ]
+        index = 2 if options["sort"] == "cumulative" else 1
+        shown.sort(key=lambda row: row[index], reverse=True)
+
+        self.stdout.write(f"{'self ms':>9} {'cumul ms':>9}  module")
+        for name, self_us, cumulative_us, depth in shown[:options["limit"]]:
+            self.stdout.write(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {'  ' * depth}{name}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Startup took {float(result.stdout.strip()) * 1000:.0f} ms; "
+            f"{len(rows)} modules imported in {total_us / 1000:.0f} ms"
+        ))
@@ -0,0 +1,282 @@
+"""
+In-process request metrics, rendered in the Prometheus text format.
+
+MetricsMiddleware records per-view latency, status and ORM query counts and
+time for every request; a few hot spots (QR rendering, password checks,
+template rendering) add their own timers. Counters and histograms live in
+this worker's memory, so scrape every worker (or aggregate in Prometheus).
+Everything is a no-op unless METRICS_ENABLED is set.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HELP = {
+    "http_requests_total": "Requests handled, by view and status class",
+    "http_request_duration_seconds": "Time spent handling a request, by view",
+    "db_queries_per_request": "ORM queries issued per request, by view",
+    "db_query_duration_seconds": "Time spent in ORM queries per request, by view",
+    "template_render_seconds": "Time spent rendering a template",
+    "qr_render_seconds": "Time spent rendering a QR code image (cache misses)",
+    "auth_check_seconds": "Time spent authenticating a password (hashing)",
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (h.buckets, list(h.counts), h.sum) for key, h in self._histograms.items()
+            }
+        return counters, histograms
+
+
+registry = Registry()
+
+
+def observe(name, value, **labels):
+    if settings.METRICS_ENABLED:
+        registry.observe(name, value, **labels)
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the duration of the block into histogram ``name``"""
+    if not settings.METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - started, **labels)
+
+
+class QueryTracker:
+    """connection.execute_wrapper that counts and times queries"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class TimedTemplate:
+    def __init__(self, template, name):
+        self.template = template
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(self.template, attr)
+
+    def render(self, context=None, request=None):
+        with timer("template_render_seconds", template=self.name):
+            return self.template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The standard Django template backend, with render timing"""
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name), template_name)
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "unmatched"
+
+
+def _record_request(request, response, started, tracker):
+    view = _view_name(request)
+    registry.inc("http_requests_total", view=view, status=f"{response.status_code // 100}xx")
+    registry.observe("http_request_duration_seconds", time.perf_counter() - started, view=view)
+    registry.observe("db_queries_per_request", tracker.count, buckets=COUNT_BUCKETS, view=view)
+    registry.observe("db_query_duration_seconds", tracker.seconds, view=view)
+
+
+# The current request's QueryTracker. A context variable rather than a
+# per-connection wrapper so queries that async views run through
+# sync_to_async (in another thread, on that thread's connection) count too.
+current_tracker = contextvars.ContextVar("current_tracker", default=None)
+
+
+def _track_query(execute, sql, params, many, context):
+    tracker = current_tracker.get()
+    if tracker is None:
+        return execute(sql, params, many, context)
+    return tracker(execute, sql, params, many, context)
+
+
+def _install_query_hook(sender=None, connection=None, **kwargs):
+    if _track_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_track_query)
+
+
+class MetricsMiddleware:
+    """Time every request and count its ORM queries"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        if settings.METRICS_ENABLED:
+            # Every connection any thread opens from now on, plus this thread's
+            connection_created.connect(_install_query_hook, dispatch_uid="shortener.metrics")
+            for conn in connections.all():
+                _install_query_hook(connection=conn)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        token = current_tracker.set(tracker)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_tracker.reset(token)
+        _record_request(request, response, started, tracker)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        token = current_tracker.set(tracker)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_tracker.reset(token)
+        _record_request(request, response, started, tracker)
+        return response
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _component_stats():
+    """Stats kept by the cache, click buffer, event log, outbox and Bloom filter.
+
+    Names ending in ``_total`` are exported as counters, the rest as gauges.
+    """
+    from . import clicks, events, lookup, mail
+    from .bloom import key_filter
+
+    gauges = {}
+    for name, value in lookup.stats.items():
+        gauges[f"shorturl_lookup_{name}_total"] = value
+    lookups = sum(lookup.stats.values())
+    if lookups:
+        hits = lookup.stats["local_hits"] + lookup.stats["shared_hits"]
+        gauges["shorturl_lookup_cache_hit_ratio"] = hits / lookups
+    for name, value in clicks.stats.items():
+        suffix = "" if name == "last_flush_seconds" else "_total"
+        gauges[f"click_flush_{name}{suffix}"] = value
+    pending = clicks.buffer.pending()
+    if pending is not None:
+        gauges["click_buffer_pending"] = pending
+    for name, value in events.stats.items():
+        gauges[f"click_events_{name}_total"] = value
+    gauges["click_events_queue_size"] = events.pending.qsize()
+    for name, value in mail.stats.items():
+        gauges[f"email_outbox_{name}_total"] = value
+    for name, value in key_filter.stats().items():
+        if isinstance(value, (bool, int, float)):
+            gauges[f"bloom_filter_{name}"] = float(value)
+    return gauges
+
+
+def render():
+    """All metrics for this process in Prometheus text exposition format"""
+    counters, histograms = registry.snapshot()
+    lines = []
+    seen = set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+    for (name, labels), (buckets, counts, total) in sorted(histograms.items()):
+        header(name, "histogram")
+        cumulative = 0
+        for bound, count in zip(buckets + ("+Inf",), counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {total}")
+        lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+    for name, value in sorted(_component_stats().items()):
+        header(name, "counter" if name.endswith("_total") else "gauge")
+        lines.append(f"{name} {value}")
+
+    return "\n".join(lines) + "\n"
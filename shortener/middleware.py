@@ -0,0 +1,62 @@
+"""
+Fast lane for public redirects.
+
+Redirects are anonymous and need none of the session, CSRF, auth, messages
+or allauth middleware, yet running them would cost a session-store read for
+any client that sends a session cookie. RedirectFastLaneMiddleware sits just
+after SecurityMiddleware, recognises ``GET /<code>/`` requests that resolve
+to the redirect view and calls that view directly, skipping the rest of the
+stack. Every other route goes through the full stack as before.
+"""
+import re
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+_SINGLE_SEGMENT = re.compile(r"^/[^/]+/$")
+
+
+def _redirect_match(request):
+    """The ResolverMatch for a redirect request, or None for anything else"""
+    if request.method not in ("GET", "HEAD") or not _SINGLE_SEGMENT.match(request.path_info):
+        return None
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    # Named routes such as dashboard/ and login/ resolve before the catch-all
+    return match if match.url_name == "redirect" else None
+
+
+class RedirectFastLaneMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        match = _redirect_match(request) if settings.REDIRECT_FAST_LANE else None
+        if match is None:
+            return self.get_response(request)
+        request.resolver_match = match
+        view = match.func
+        if iscoroutinefunction(view):
+            view = async_to_sync(view)
+        return view(request, *match.args, **match.kwargs)
+
+    async def __acall__(self, request):
+        match = _redirect_match(request) if settings.REDIRECT_FAST_LANE else None
+        if match is None:
+            return await self.get_response(request)
+        request.resolver_match = match
+        view = match.func
+        if not iscoroutinefunction(view):
+            view = sync_to_async(view)
+        return await view(request, *match.args, **match.kwargs)
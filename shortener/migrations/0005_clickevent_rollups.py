@@ -0,0 +1,56 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0004_passwordresetotp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClickEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('short_key', models.CharField(max_length=20)),
+                ('timestamp', models.DateTimeField()),
+                ('referrer', models.CharField(blank=True, max_length=500)),
+                ('user_agent_hash', models.CharField(blank=True, max_length=16)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyClickRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('short_key', models.CharField(max_length=20)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('bucket', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HourlyClickRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('short_key', models.CharField(max_length=20)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('bucket', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyclickrollup',
+            constraint=models.UniqueConstraint(fields=('short_key', 'bucket'), name='daily_rollup_key_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='hourlyclickrollup',
+            constraint=models.UniqueConstraint(fields=('short_key', 'bucket'), name='hourly_rollup_key_bucket'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:38
+
+from django.db import migrations, models
+
+# Keep in sync with shortener.keys.SEQUENCE_NAME / BLOCK_SIZE
+SEQUENCE_NAME = "shortener_short_key_seq"
+BLOCK_SIZE = 1000
+
+
+def create_counter(apps, schema_editor):
+    KeySequence = apps.get_model("shortener", "KeySequence")
+    KeySequence.objects.using(schema_editor.connection.alias).get_or_create(name="short_key")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME} INCREMENT BY {BLOCK_SIZE} MINVALUE 0 START WITH 0"
+        )
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCE_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0005_clickevent_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KeySequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_counter, drop_sequence),
+    ]
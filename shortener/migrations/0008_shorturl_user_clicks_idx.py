@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0007_shorturl_user_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shorturl',
+            index=models.Index(fields=['user', 'clicks', 'id'], name='shorturl_user_clicks_idx'),
+        ),
+    ]
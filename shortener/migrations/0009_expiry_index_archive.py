@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0008_shorturl_user_clicks_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shorturl',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ArchivedShortURL',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField()),
+                ('original_url', models.URLField()),
+                ('short_key', models.CharField(max_length=20)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+from shortener.utils import url_hash
+
+BATCH_SIZE = 2000
+
+
+def backfill_url_hash(apps, schema_editor):
+    """Hash existing rows in id-ordered batches (before the index exists)"""
+    ShortURL = apps.get_model("shortener", "ShortURL")
+    rows = ShortURL.objects.using(schema_editor.connection.alias).order_by("id")
+    last_id = 0
+    while True:
+        batch = list(rows.filter(id__gt=last_id).only("id", "original_url")[:BATCH_SIZE])
+        if not batch:
+            break
+        for row in batch:
+            row.url_hash = url_hash(row.original_url)
+        ShortURL.objects.using(schema_editor.connection.alias).bulk_update(batch, ["url_hash"])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0009_expiry_index_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shorturl',
+            name='url_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.RunPython(backfill_url_hash, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='shorturl',
+            index=models.Index(fields=['user', 'url_hash'], name='shorturl_user_urlhash_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+INDEX_NAME = "shorturl_url_trgm_idx"
+
+
+def create_trigram_index(apps, schema_editor):
+    # PostgreSQL only; SQLite keeps scanning for substring search
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Matches the UPPER(col::text) LIKE UPPER(...) that icontains generates
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON shortener_shorturl "
+        f"USING gin ((UPPER(original_url::text)) gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0010_shorturl_url_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
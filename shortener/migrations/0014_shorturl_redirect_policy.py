@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shortener', '0013_one_time_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shorturl',
+            name='cache_max_age',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='shorturl',
+            name='redirect_type',
+            field=models.CharField(choices=[('302', 'Temporary (302), every click reaches us'), ('307', 'Temporary, keeps the method (307)'), ('301', 'Permanent (301), cacheable'), ('cached', 'Temporary (302), cacheable')], default='302', max_length=6),
+        ),
+    ]
@@ -1,10 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
-import pyotp
 from django.utils import timezone
 from datetime import timedelta
 
+from .utils import url_hash
+
 class PasswordResetOTP(models.Model):
+    """Legacy OTP log, superseded by shortener.otp; emptied by `purge_otps`"""
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     otp = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -21,6 +23,16 @@ class PasswordResetOTP(models.Model):
         expiry_time = self.created_at + timedelta(minutes=10)
         return timezone.now() <= expiry_time and not self.is_used
 
+class OneTimeCode(models.Model):
+    """Outstanding OTPs for shortener.otp's database store (OTP_STORE = "db")"""
+    key = models.CharField(max_length=100, primary_key=True)
+    code_hash = models.CharField(max_length=64)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key} (expires {self.expires_at})"
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     phone = models.CharField(max_length=15, unique=True)
@@ -37,23 +49,159 @@ class UserProfile(models.Model):
     def get_totp(self):
         """Get TOTP object for 2FA verification"""
         if self.two_factor_secret:
+            import pyotp
             return pyotp.TOTP(self.two_factor_secret)
         return None
     
     def generate_backup_codes(self, count=10):
         """Generate backup codes for recovery"""
         import json
+        import pyotp
         codes = [pyotp.random_base32()[:8] for _ in range(count)]
         self.backup_codes = json.dumps(codes)
         return codes
 
 class ShortURL(models.Model):
+    REDIRECT_TEMPORARY = "302"
+    REDIRECT_TEMPORARY_KEEP_METHOD = "307"
+    REDIRECT_PERMANENT = "301"
+    REDIRECT_CACHED = "cached"
+    REDIRECT_CHOICES = [
+        (REDIRECT_TEMPORARY, "Temporary (302), every click reaches us"),
+        (REDIRECT_TEMPORARY_KEEP_METHOD, "Temporary, keeps the method (307)"),
+        (REDIRECT_PERMANENT, "Permanent (301), cacheable"),
+        (REDIRECT_CACHED, "Temporary (302), cacheable"),
+    ]
+    # Served with Cache-Control: public, max-age; browsers and CDNs skip us
+    # (and the click counter) until it runs out
+    CACHEABLE_REDIRECTS = (REDIRECT_PERMANENT, REDIRECT_CACHED)
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     original_url = models.URLField()
     short_key = models.CharField(max_length=20, unique=True)
     clicks = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # utils.url_hash(original_url); set by save() and the bulk paths
+    url_hash = models.CharField(max_length=32, blank=True, default="", editable=False)
+    redirect_type = models.CharField(max_length=6, choices=REDIRECT_CHOICES, default=REDIRECT_TEMPORARY)
+    # Seconds a cacheable redirect may be cached; None means REDIRECT_CACHE_MAX_AGE
+    cache_max_age = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Serves the per-user listings, newest first (keyset pagination)
+            models.Index(fields=["user", "created_at", "id"], name="shorturl_user_created_idx"),
+            # Serves the dashboard's "most/least clicked" sorts
+            models.Index(fields=["user", "clicks", "id"], name="shorturl_user_clicks_idx"),
+            # Finds an existing link for the same URL when deduplicating
+            models.Index(fields=["user", "url_hash"], name="shorturl_user_urlhash_idx"),
+        ]
+
+    def __str__(self):
+        return self.short_key
+
+    def save(self, *args, **kwargs):
+        self.url_hash = url_hash(self.original_url)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "original_url" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "url_hash"}
+        super().save(*args, **kwargs)
+
+
+class ArchivedShortURL(models.Model):
+    """Expired ShortURLs moved out of the live table by `purge_expired --archive`"""
+    original_id = models.BigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    original_url = models.URLField()
+    short_key = models.CharField(max_length=20)
+    clicks = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
     expires_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.short_key
+
+
+class ClickEvent(models.Model):
+    """Append-only log of redirects, written in batches by shortener.events"""
+    short_key = models.CharField(max_length=20)
+    timestamp = models.DateTimeField()
+    referrer = models.CharField(max_length=500, blank=True)
+    user_agent_hash = models.CharField(max_length=16, blank=True)
+
+    def __str__(self):
+        return f"{self.short_key} @ {self.timestamp}"
+
+
+class ClickRollup(models.Model):
+    short_key = models.CharField(max_length=20)
+    clicks = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class HourlyClickRollup(ClickRollup):
+    bucket = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["short_key", "bucket"], name="hourly_rollup_key_bucket"),
+        ]
+
+
+class DailyClickRollup(ClickRollup):
+    bucket = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["short_key", "bucket"], name="daily_rollup_key_bucket"),
+        ]
+
+
+class RollupCheckpoint(models.Model):
+    """Highest ClickEvent id already folded into the rollup tables"""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_event_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_event_id}"
+
+
+class KeySequence(models.Model):
+    """Block reservation counter for shortener.keys (non-Postgres databases)"""
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+class EmailOutbox(models.Model):
+    """Outgoing email queued by shortener.mail.OutboxBackend"""
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (SENT, "Sent"), (FAILED, "Failed")]
+
+    subject = models.CharField(max_length=998)
+    recipients = models.TextField()
+    # Everything needed to rebuild the EmailMessage (see mail.serialize)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The sender's "what is due" query
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipients} ({self.status})"
@@ -0,0 +1,102 @@
+"""
+One-time codes for password reset.
+
+Codes are kept in a TTL store under a key derived from the purpose and the
+email address, so checking one is a single key lookup instead of a query on
+an ever-growing table. Only an HMAC of the code is stored, issuing a new
+code replaces the outstanding one, and ``consume()`` succeeds at most once
+per code even when two requests race.
+
+Two stores are available (settings.OTP_STORE):
+
+* ``cache`` keeps codes in CACHES["default"] with a timeout. Consume-once
+  relies on ``cache.delete()`` reporting whether this caller removed the key,
+  which Redis (DEL) and locmem both do atomically. Needs a cache shared by
+  every worker, i.e. REDIS_URL.
+* ``db`` keeps them in OneTimeCode and consumes with one conditional DELETE.
+"""
+import hashlib
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .models import OneTimeCode
+
+PASSWORD_RESET = "password_reset"
+
+
+def _key(purpose, email):
+    # Hashed so addresses don't end up in cache keys
+    return f"{purpose}:{hashlib.sha256(email.strip().lower().encode()).hexdigest()[:40]}"
+
+
+def _digest(key, code):
+    return salted_hmac("shortener.otp", f"{key}:{code}", algorithm="sha256").hexdigest()
+
+
+class CacheOTPStore:
+    prefix = "otp:"
+
+    def issue(self, key, digest, user_id, ttl):
+        cache.set(self.prefix + key, (digest, user_id), ttl)
+
+    def consume(self, key, digest):
+        value = cache.get(self.prefix + key)
+        if value is None or not constant_time_compare(value[0], digest):
+            return None
+        # Only the request whose delete removes the key gets to use the code
+        if not cache.delete(self.prefix + key):
+            return None
+        return value[1]
+
+
+class DatabaseOTPStore:
+    def issue(self, key, digest, user_id, ttl):
+        OneTimeCode.objects.update_or_create(
+            key=key,
+            defaults={
+                "code_hash": digest,
+                "user_id": user_id,
+                "expires_at": timezone.now() + timedelta(seconds=ttl),
+            },
+        )
+
+    def consume(self, key, digest):
+        row = (
+            OneTimeCode.objects.filter(key=key, expires_at__gt=timezone.now())
+            .values_list("code_hash", "user_id")
+            .first()
+        )
+        if row is None or not constant_time_compare(row[0], digest):
+            return None
+        deleted, _ = OneTimeCode.objects.filter(key=key, code_hash=row[0]).delete()
+        return row[1] if deleted else None
+
+
+def _make_store():
+    if settings.OTP_STORE == "db":
+        return DatabaseOTPStore()
+    return CacheOTPStore()
+
+
+store = _make_store()
+
+
+def issue(user, email, purpose=PASSWORD_RESET):
+    """Create a 6-digit code for ``user`` (replacing any outstanding one)"""
+    code = f"{secrets.randbelow(10 ** 6):06d}"
+    key = _key(purpose, email)
+    store.issue(key, _digest(key, code), user.pk, settings.OTP_TTL)
+    return code
+
+
+def consume(email, code, purpose=PASSWORD_RESET):
+    """Return the user id the code was issued to and invalidate it, or None"""
+    if not code:
+        return None
+    key = _key(purpose, email)
+    return store.consume(key, _digest(key, code.strip()))
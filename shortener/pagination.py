@@ -0,0 +1,76 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are selected with a WHERE clause on the ordering columns of the last
+row seen instead of OFFSET, so fetching page 1,000 costs the same as page 1
+as long as an index matches the ordering. The ordering must end in a unique
+column (normally "id") to be a total order.
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return the list of ordering values in ``cursor``; raises ValueError"""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def _value(row, name):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def keyset_filter(queryset, ordering, values):
+    """Restrict ``queryset`` to rows strictly after ``values`` in ``ordering``"""
+    if len(values) != len(ordering):
+        raise ValueError("Invalid cursor")
+    model = queryset.model
+    fields = [o.lstrip("-") for o in ordering]
+    try:
+        values = [
+            model._meta.get_field(name).to_python(value)
+            for name, value in zip(fields, values)
+        ]
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
+
+    # (a, b) after (x, y)  <=>  a > x  OR  (a = x AND b > y), per direction
+    condition = Q()
+    for i, order in enumerate(ordering):
+        lookup = "lt" if order.startswith("-") else "gt"
+        term = Q(**{f"{fields[i]}__{lookup}": values[i]})
+        for name, value in zip(fields[:i], values[:i]):
+            term &= Q(**{name: value})
+        condition |= term
+    return queryset.filter(condition)
+
+
+def keyset_page(queryset, ordering, page_size, cursor=None):
+    """Return (rows, next_cursor) for one page; next_cursor is None at the end.
+
+    ``queryset`` may be a model or a .values() queryset, but must include
+    every ordering field. Raises ValueError for a malformed cursor.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = keyset_filter(queryset, ordering, decode_cursor(cursor))
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([_value(last, o.lstrip("-")) for o in ordering])
+    return rows, next_cursor
@@ -0,0 +1,245 @@
+"""
+Token-bucket rate limiting for views.
+
+Each scope (``"login"``, ``"create"``, ...) has a policy in
+settings.RATELIMIT_POLICIES mapping a key function to a rate, e.g.
+``{"ip": "10/m", "username": "5/m"}``. A request spends one token from every
+bucket it maps to; buckets refill continuously at the given rate and hold at
+most that many tokens, so short bursts up to the limit are allowed. When any
+bucket is empty the view is not called at all and the client gets 429 with
+Retry-After.
+
+Buckets live in the shared cache by default, so limits hold across workers.
+Updates are read-modify-write, which lets a handful of truly concurrent
+requests overshoot a limit slightly; that is fine for throttling abuse.
+Scopes listed in RATELIMIT_LOCAL_SCOPES keep their buckets in process memory
+instead, which costs nothing on hot paths at the price of per-worker limits.
+"""
+import functools
+import hashlib
+import ipaddress
+import json
+import math
+import sys
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.http.request import RawPostDataException
+
+from . import metrics
+from .lookup import LRUCache
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+KEY_PREFIX = "rl:"
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60.0); also accepts a multiplier such as '3/10m'"""
+    count, period = rate.split("/")
+    multiplier = period[:-1] or "1"
+    return int(count), float(multiplier) * PERIODS[period[-1]]
+
+
+@functools.lru_cache(maxsize=None)
+def _trusted_networks(proxies):
+    return tuple(ipaddress.ip_network(proxy.strip(), strict=False) for proxy in proxies if proxy.strip())
+
+
+def _is_trusted(addr, networks):
+    try:
+        ip = ipaddress.ip_address(addr)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_ip(request, view_kwargs=None):
+    """The client address, skipping proxies listed in RATELIMIT_TRUSTED_PROXIES.
+
+    X-Forwarded-For is read from the right, starting at REMOTE_ADDR, and only
+    as long as the hop that appended the entry is trusted; whatever a client
+    puts at the left end of the header is never believed.
+    """
+    addr = request.META.get("REMOTE_ADDR", "")
+    networks = _trusted_networks(tuple(settings.RATELIMIT_TRUSTED_PROXIES))
+    if not networks:
+        return addr
+    forwarded = [hop.strip() for hop in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")]
+    while _is_trusted(addr, networks) and forwarded:
+        hop = forwarded.pop()
+        if not hop:
+            break
+        addr = hop
+    return addr
+
+
+def _user(request, view_kwargs=None):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return str(user.pk)
+    return None
+
+
+def _json_body(request):
+    if request.content_type != "application/json":
+        return {}
+    try:
+        data = json.loads(request.body or b"{}")
+    except (ValueError, RawPostDataException):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _field(name):
+    """Key on ``name`` from the URL kwargs, the form body or a JSON body"""
+    def key(request, view_kwargs=None):
+        value = (view_kwargs or {}).get(name)
+        if value is None:
+            value = request.POST.get(name) or _json_body(request).get(name)
+        if not isinstance(value, str):
+            return None
+        return value.strip().lower() or None
+    return key
+
+
+# Key functions take (request, view_kwargs) and return None when they
+# don't apply (e.g. anonymous "user")
+KEY_FUNCTIONS = {
+    "ip": client_ip,
+    "user": _user,
+    "user_or_ip": lambda request, view_kwargs=None: _user(request) or "ip:" + client_ip(request),
+    "username": _field("username"),
+    "email": _field("email"),
+}
+
+
+def take(state, now, capacity, period):
+    """Spend one token. Returns (new_state, seconds_until_a_token_or_0)"""
+    refill = capacity / period
+    if state is None:
+        tokens = float(capacity)
+    else:
+        tokens, stamp = state
+        tokens = min(float(capacity), tokens + (now - stamp) * refill)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / refill
+
+
+class LocalBuckets:
+    """Buckets in this process's memory"""
+
+    def __init__(self, maxsize=100000):
+        self._buckets = LRUCache(maxsize, ttl=86400)
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, period):
+        with self._lock:
+            state, wait = take(self._buckets.get(key), time.monotonic(), capacity, period)
+            self._buckets.set(key, state, ttl=period)
+        return wait
+
+    async def aconsume(self, key, capacity, period):
+        return self.consume(key, capacity, period)
+
+
+class CacheBuckets:
+    """Buckets in the shared Django cache"""
+
+    def consume(self, key, capacity, period):
+        state, wait = take(cache.get(key), time.time(), capacity, period)
+        cache.set(key, state, math.ceil(period))
+        return wait
+
+    async def aconsume(self, key, capacity, period):
+        state, wait = take(await cache.aget(key), time.time(), capacity, period)
+        await cache.aset(key, state, math.ceil(period))
+        return wait
+
+
+local_buckets = LocalBuckets()
+cache_buckets = CacheBuckets()
+
+
+def _buckets_for(scope, request, view_kwargs=None):
+    """Yield (cache_key, capacity, period) for every bucket this request spends from"""
+    for key_name, rate in settings.RATELIMIT_POLICIES.get(scope, {}).items():
+        ident = KEY_FUNCTIONS[key_name](request, view_kwargs)
+        if not ident:
+            continue
+        capacity, period = parse_rate(rate)
+        digest = hashlib.blake2b(ident.encode(), digest_size=12).hexdigest()
+        yield f"{KEY_PREFIX}{scope}:{key_name}:{digest}", capacity, period
+
+
+def _store(scope):
+    return local_buckets if scope in settings.RATELIMIT_LOCAL_SCOPES else cache_buckets
+
+
+def check(scope, request, view_kwargs=None):
+    """Spend a token from each of the scope's buckets; return the longest wait (0 if allowed)"""
+    store = _store(scope)
+    wait = 0
+    for key, capacity, period in _buckets_for(scope, request, view_kwargs):
+        wait = max(wait, store.consume(key, capacity, period))
+    return wait
+
+
+async def acheck(scope, request, view_kwargs=None):
+    store = _store(scope)
+    wait = 0
+    for key, capacity, period in _buckets_for(scope, request, view_kwargs):
+        wait = max(wait, await store.aconsume(key, capacity, period))
+    return wait
+
+
+def too_many_requests(request, scope, wait):
+    if settings.METRICS_ENABLED:
+        metrics.registry.inc("ratelimit_rejections_total", scope=scope)
+    message = "Too many requests. Please try again later."
+    # DRF views get JSON; no DRF Request can exist unless DRF is loaded
+    drf_request = sys.modules.get("rest_framework.request")
+    if drf_request and isinstance(request, drf_request.Request):
+        response = JsonResponse({"detail": message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type="text/plain")
+    response["Retry-After"] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def ratelimit(scope, methods=None):
+    """Throttle a view (sync or async) with the policy for ``scope``.
+
+    ``methods`` limits throttling to those HTTP methods, e.g. ("POST",) to
+    leave the GET that renders a form alone. Apply it below DRF's
+    @api_view/@permission_classes so request.user is the authenticated user.
+    """
+    def applies(request):
+        return settings.RATELIMIT_ENABLED and (methods is None or request.method in methods)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if applies(request):
+                    wait = await acheck(scope, request, kwargs)
+                    if wait:
+                        return too_many_requests(request, scope, wait)
+                return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if applies(request):
+                wait = check(scope, request, kwargs)
+                if wait:
+                    return too_many_requests(request, scope, wait)
+            return view(request, *args, **kwargs)
+        return wrapper
+
+    return decorator
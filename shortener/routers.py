@@ -0,0 +1,163 @@
+"""
+Read-replica routing.
+
+When DB_REPLICA_URL is set, views decorated with @use_replica send reads of
+this app's models to the "replica" alias. Everything else (writes, sessions
+and auth, background flushers, management commands) stays on "default".
+
+Replicas lag, so reads fall back to the primary when:
+
+* the user wrote a link in the last DB_REPLICA_PIN_SECONDS (read-your-writes;
+  see pin_user(), called from the ShortURL signals),
+* the measured replication lag exceeds DB_REPLICA_MAX_LAG,
+* a redirect lookup misses on the replica (lookup.load retries the primary
+  when DB_REPLICA_FALLBACK_ON_MISS is set), or
+* the short key was changed in the last DB_REPLICA_PIN_SECONDS (lookup
+  marks invalidated keys). Entries read from the replica are kept in the
+  shared cache for at most SHORTURL_REPLICA_CACHE_TIMEOUT.
+"""
+import contextvars
+import functools
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA = "replica"
+PIN_KEY = "dbpin:user:"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_read_alias = contextvars.ContextVar("read_alias", default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def reading_from_replica():
+    return _read_alias.get() == REPLICA
+
+
+def pin_user(user_id):
+    """Keep ``user_id``'s reads on the primary until the replica has caught up"""
+    if user_id and replica_configured() and settings.DB_REPLICA_PIN_SECONDS:
+        cache.set(f"{PIN_KEY}{user_id}", 1, settings.DB_REPLICA_PIN_SECONDS)
+
+
+class LagMonitor:
+    """Measures replica lag at most every DB_REPLICA_LAG_CHECK_INTERVAL seconds"""
+
+    def __init__(self):
+        self._checked_at = float("-inf")
+        self._healthy = True
+
+    def _measure(self):
+        conn = connections[REPLICA]
+        if conn.vendor != "postgresql":
+            return 0.0
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT CASE WHEN pg_is_in_recovery() THEN "
+                "COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                "ELSE 0 END"
+            )
+            return float(cursor.fetchone()[0])
+
+    def stale(self):
+        interval = settings.DB_REPLICA_LAG_CHECK_INTERVAL
+        return (
+            settings.DB_REPLICA_MAX_LAG is not None
+            and time.monotonic() - self._checked_at >= interval
+        )
+
+    def refresh(self):
+        self._checked_at = time.monotonic()
+        try:
+            lag = self._measure()
+        except Exception:
+            logger.exception("Measuring replica lag failed; reading from the primary")
+            self._healthy = False
+        else:
+            self._healthy = lag <= settings.DB_REPLICA_MAX_LAG
+            if not self._healthy:
+                logger.warning("Replica is %.1fs behind; reading from the primary", lag)
+
+    def healthy(self):
+        if settings.DB_REPLICA_MAX_LAG is None:
+            return True
+        if self.stale():
+            self.refresh()
+        return self._healthy
+
+
+lag_monitor = LagMonitor()
+
+
+def _choose_alias(request, check_pin):
+    if not replica_configured() or request.method not in SAFE_METHODS:
+        return None
+    if check_pin:
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated and cache.get(f"{PIN_KEY}{user.pk}"):
+            return None
+    if not lag_monitor.healthy():
+        return None
+    return REPLICA
+
+
+def use_replica(view=None, *, check_pin=True):
+    """Route the view's ORM reads to the replica for safe methods.
+
+    Pass check_pin=False for views that must not touch request.user (the
+    redirect path), which then rely on the miss fallback instead. Apply it
+    below DRF's @api_view/@permission_classes so request.user is known.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if replica_configured() and lag_monitor.stale():
+                    await sync_to_async(lag_monitor.refresh)()
+                if check_pin:
+                    alias = await sync_to_async(_choose_alias)(request, check_pin)
+                else:
+                    alias = _choose_alias(request, check_pin)
+                token = _read_alias.set(alias)
+                try:
+                    return await view(request, *args, **kwargs)
+                finally:
+                    _read_alias.reset(token)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = _read_alias.set(_choose_alias(request, check_pin))
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _read_alias.reset(token)
+        return wrapper
+
+    return decorator(view) if view is not None else decorator
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Sessions and users stay on the primary: a login must be visible at once
+        if model._meta.app_label == "shortener":
+            return _read_alias.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
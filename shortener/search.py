@@ -0,0 +1,31 @@
+"""
+Index-backed search over short URLs.
+
+* Short keys match by prefix (``LIKE 'abc%'``), which PostgreSQL serves from
+  the ``varchar_pattern_ops`` index Django creates for the unique short_key.
+  Keys are case-sensitive, so the match is too.
+* Original URLs match by case-insensitive substring. On PostgreSQL the
+  ``UPPER(original_url) LIKE UPPER('%...%')`` that ``icontains`` produces is
+  served by a pg_trgm GIN index (migration 0011). Trigrams need at least
+  three characters, so shorter terms only search keys. Other databases
+  (SQLite in development and tests) fall back to a scan.
+"""
+from django.db.models import Q
+
+FIELDS = ("any", "key", "url")
+MIN_SUBSTRING_LENGTH = 3
+
+
+def search_links(queryset, term, field="any"):
+    """Filter ``queryset`` to links whose key starts with / URL contains ``term``"""
+    term = (term or "").strip()
+    if not term:
+        return queryset
+    condition = Q()
+    if field in ("any", "key"):
+        condition |= Q(short_key__startswith=term)
+    if field in ("any", "url") and len(term) >= MIN_SUBSTRING_LENGTH:
+        condition |= Q(original_url__icontains=term)
+    if not condition:
+        return queryset.none()
+    return queryset.filter(condition)
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import Signal, receiver
+
+from . import bloom, cdn, lookup, routers, usercache
+from .models import ShortURL
+
+# Sent after ShortURLs are inserted with bulk_create (which skips post_save),
+# with ``short_keys`` listing the new keys and optionally their ``user_id``.
+short_urls_created = Signal()
+
+
+# What a redirect response depends on; a change means cached copies are stale
+REDIRECT_FIELDS = ("original_url", "expires_at", "redirect_type", "cache_max_age")
+
+
+def _redirect_state(instance):
+    return {name: instance.__dict__.get(name) for name in REDIRECT_FIELDS}
+
+
+@receiver(post_init, sender=ShortURL)
+def remember_short_key(sender, instance, **kwargs):
+    """Keep the loaded short_key so a rename can invalidate the old entry"""
+    # Read from __dict__ so deferred loads (.only()/.defer()) don't query
+    instance._loaded_short_key = instance.__dict__.get("short_key")
+    instance._loaded_redirect = _redirect_state(instance)
+
+
+@receiver(post_save, sender=ShortURL)
+def invalidate_on_save(sender, instance, created, **kwargs):
+    codes = {instance.short_key, instance._loaded_short_key}
+    is_new_key = created or instance.short_key != instance._loaded_short_key
+    was_cacheable = instance._loaded_redirect["redirect_type"] in ShortURL.CACHEABLE_REDIRECTS
+    changed = is_new_key or _redirect_state(instance) != instance._loaded_redirect
+    if not created and was_cacheable and changed:
+        transaction.on_commit(lambda: cdn.purge(*codes))
+    instance._loaded_short_key = instance.short_key
+    instance._loaded_redirect = _redirect_state(instance)
+    transaction.on_commit(lambda: lookup.invalidate(*codes))
+    routers.pin_user(instance.user_id)
+    if is_new_key:
+        bloom.key_filter.add(instance.short_key)
+        transaction.on_commit(lambda: bloom.bump_generation(instance.short_key))
+
+
+@receiver(post_delete, sender=ShortURL)
+def invalidate_on_delete(sender, instance, **kwargs):
+    codes = {instance.short_key, instance._loaded_short_key}
+    transaction.on_commit(lambda: lookup.invalidate(*codes))
+    if instance._loaded_redirect["redirect_type"] in ShortURL.CACHEABLE_REDIRECTS:
+        transaction.on_commit(lambda: cdn.purge(*codes))
+    bloom.key_filter.note_deleted()
+    routers.pin_user(instance.user_id)
+
+
+@receiver(short_urls_created)
+def invalidate_on_bulk_create(sender, short_keys, user_id=None, **kwargs):
+    transaction.on_commit(lambda: lookup.invalidate(*short_keys))
+    routers.pin_user(user_id)
+    bloom.key_filter.add(*short_keys)
+    transaction.on_commit(lambda: bloom.bump_generation(*short_keys))
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the API's cached copy when a user changes (password, is_active, ...)"""
+    usercache.invalidate_user(instance.pk)
+    transaction.on_commit(lambda: usercache.invalidate_user(instance.pk))
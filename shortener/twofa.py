@@ -0,0 +1,83 @@
+"""
+Two-factor authentication setup views.
+
+In their own module so pyotp and the QR encoder load on first use rather
+than in every worker at startup.
+"""
+import base64
+import json
+
+import pyotp
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect, render
+
+from . import qr
+
+
+@login_required
+def setup_two_fa(request):
+    """Setup 2FA for user"""
+    profile = request.user.userprofile
+    
+    if profile.two_factor_enabled:
+        messages.warning(request, "2FA is already enabled. Disable it first to set it up again.")
+        return redirect("settings")
+    
+    # Generate new secret if not in session
+    if 'temp_2fa_secret' not in request.session:
+        secret = pyotp.random_base32()
+        request.session['temp_2fa_secret'] = secret
+    else:
+        secret = request.session['temp_2fa_secret']
+    
+    # Generate QR code
+    totp = pyotp.TOTP(secret)
+    qr_uri = totp.provisioning_uri(name=request.user.email, issuer_name='URL Shortener')
+    
+    # Contains the TOTP secret, so never put it in the shared cache
+    qr_code_base64 = base64.b64encode(qr.render(qr_uri, use_cache=False)).decode()
+    
+    if request.method == "POST":
+        code = request.POST.get("code")
+        if totp.verify(code):
+            profile.two_factor_secret = secret
+            profile.two_factor_enabled = True
+            backup_codes = profile.generate_backup_codes()
+            profile.save()
+            del request.session['temp_2fa_secret']
+            return render(request, "two_fa_backup_codes.html", {"backup_codes": backup_codes})
+        else:
+            messages.error(request, "Invalid code. Please try again.")
+    
+    return render(request, "two_fa_setup.html", {
+        "qr_code": qr_code_base64,
+        "secret": secret,
+        "email": request.user.email
+    })
+
+
+@login_required
+def disable_two_fa(request):
+    """Disable 2FA"""
+    profile = request.user.userprofile
+    
+    if not profile.two_factor_enabled:
+        messages.warning(request, "2FA is not enabled.")
+        return redirect("settings")
+    
+    if request.method == "POST":
+        code = request.POST.get("code")
+        totp = profile.get_totp()
+        
+        if totp and (totp.verify(code) or code in json.loads(profile.backup_codes or "[]")):
+            profile.two_factor_enabled = False
+            profile.two_factor_secret = None
+            profile.backup_codes = None
+            profile.save()
+            messages.success(request, "2FA has been disabled.")
+            return redirect("settings")
+        else:
+            messages.error(request, "Invalid code.")
+    
+    return render(request, "two_fa_disable.html")
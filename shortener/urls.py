@@ -1,10 +1,16 @@
+from django.conf import settings
 from django.urls import path
 from . import views
+from .utils import lazy_path
+
+# Serve redirects from the native async view when running under ASGI
+redirect_view = views.redirect_url_async if settings.ASYNC_REDIRECT else views.redirect_url
 
 urlpatterns = [
     path("", views.home, name="home"),
     path("dashboard/", views.dashboard, name="dashboard"),
     path("create/", views.create_url, name="create"),
+    path("export/", views.export_urls, name="export"),
     path("edit/<int:id>/", views.edit_url, name="edit"),
     path("delete/<int:id>/", views.delete_url, name="delete"),
     path("qr/<int:id>/", views.generate_qr_code, name="qr_code"),
@@ -13,10 +19,15 @@ urlpatterns = [
     path("login/", views.login_view, name="login"),
     path("logout/", views.logout_view, name="logout"),
     path("settings/", views.settings_view, name="settings"),
-    path("2fa/setup/", views.setup_two_fa, name="setup_2fa"),
-    path("2fa/disable/", views.disable_two_fa, name="disable_2fa"),
-    path("<str:code>/", views.redirect_url, name="redirect"),
-    path("api/register/", views.api_register, name="api_register"),
-    path("api/urls/", views.api_urls, name="api_urls"),
-    path("api/urls/<int:id>/", views.api_url_detail, name="api_url_detail"),
+    lazy_path("2fa/setup/", "shortener.twofa.setup_two_fa", name="setup_2fa"),
+    lazy_path("2fa/disable/", "shortener.twofa.disable_two_fa", name="disable_2fa"),
+    path("metrics/", views.metrics_view, name="metrics"),
+    path("<str:code>/", redirect_view, name="redirect"),
+    lazy_path("api/register/", "shortener.api.api_register", name="api_register"),
+    lazy_path("api/urls/", "shortener.api.api_urls", name="api_urls"),
+    lazy_path("api/urls/bulk/", "shortener.api.api_urls_bulk", name="api_urls_bulk"),
+    lazy_path("api/urls/search/", "shortener.api.api_urls_search", name="api_urls_search"),
+    lazy_path("api/urls/<int:id>/", "shortener.api.api_url_detail", name="api_url_detail"),
+    lazy_path("api/urls/<int:id>/clicks/", "shortener.api.api_url_clicks", name="api_url_clicks"),
+    lazy_path("api/stats/bloom/", "shortener.api.api_bloom_stats", name="api_bloom_stats"),
 ]
@@ -0,0 +1,18 @@
+"""
+Cache keys for the API's per-user authentication entries.
+
+Kept apart from authentication.py, which imports DRF and simplejwt, so
+the User save/delete signals can invalidate entries without loading the
+API stack into web-only workers.
+"""
+from django.core.cache import cache
+
+CACHE_KEY_PREFIX = "jwtuser:v2:"
+
+
+def user_cache_key(user_id):
+    return f"{CACHE_KEY_PREFIX}{user_id}"
+
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
@@ -1,7 +1,147 @@
-import random
+import atexit
+import hashlib
+import logging
+import os
 import string
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import path
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
 
 BASE62 = string.ascii_letters + string.digits
 
-def generate_short_key(length=6):
-    return ''.join(random.choices(BASE62, k=length))
+# Cache backends whose contents live inside one process
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def cache_is_shared(alias="default"):
+    """Whether every worker process sees the same CACHES[alias] (e.g. Redis)"""
+    return settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_CACHES
+
+
+def generate_short_key():
+    """Mint a new short key; unique by construction (see keys.py)"""
+    from .keys import allocator
+    return allocator.next_key()
+
+
+class LazyView:
+    """URLconf callback that imports the view at ``path`` on first use.
+
+    Keeps heavy modules (DRF, drf_yasg, pyotp) out of worker startup and out
+    of requests that never reach them. Attribute lookups such as
+    CsrfViewMiddleware's ``csrf_exempt`` check load the view too, so flags set
+    by its decorators still apply. Only for sync views.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._view = None
+
+    @property
+    def view(self):
+        if self._view is None:
+            self._view = import_string(self.path)
+        return self._view
+
+    def __call__(self, request, *args, **kwargs):
+        return self.view(request, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.view, name)
+
+    def __repr__(self):
+        return f"<LazyView {self.path}>"
+
+
+def lazy_path(route, view, kwargs=None, name=None):
+    """``path(route, LazyView(view), ...)`` that stays lazy through reverse().
+
+    The first reverse() or {% url %} builds the resolver, which asks every
+    pattern for its ``lookup_str`` by probing the callback's ``view_class``;
+    on a LazyView that would import the view. The dotted path is the same
+    string, so it is filled in up front.
+    """
+    pattern = path(route, LazyView(view), kwargs, name)
+    pattern.lookup_str = view
+    return pattern
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url):
+    """Canonical form used to spot duplicate links.
+
+    Lowercases the scheme and host, drops default ports and the fragment
+    (never sent to the server) and turns an empty path into "/". The path
+    and query are case-sensitive and kept as they are.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = f"[{host}]" if ":" in host else host
+    if parts.username or parts.password:
+        netloc = parts.netloc.rsplit("@", 1)[0] + "@" + netloc
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc += f":{port}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def url_hash(url):
+    """32-character hex digest of the normalized URL (ShortURL.url_hash)"""
+    return hashlib.blake2b(normalize_url(url).encode(), digest_size=16).hexdigest()
+
+
+class BackgroundFlusher:
+    """Run ``flush`` on a daemon thread every ``interval`` seconds.
+
+    The thread is started lazily in each process (so it survives gunicorn's
+    fork), can be woken early with ``poke()`` and flushes once more at exit.
+    """
+
+    def __init__(self, name, flush, interval):
+        self.name = name
+        self.flush = flush
+        self.interval = interval
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name=self.name, daemon=True).start()
+            atexit.register(self.run_once)
+
+    def poke(self):
+        self._wake.set()
+
+    def run_once(self):
+        close_old_connections()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("%s flush failed", self.name)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.run_once()
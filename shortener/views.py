@@ -1,21 +1,26 @@
-import random
-import string
-import qrcode
-import pyotp
 import json
-from io import BytesIO
-import base64
+import hmac
 from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.http import HttpResponseRedirect, HttpResponse
+from django.db.models import Count, Sum
+from django.http import (
+    Http404, HttpResponse, HttpResponseForbidden, HttpResponseGone, HttpResponseRedirect,
+    StreamingHttpResponse,
+)
 from django.contrib import messages
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.response import Response
+from django.utils import timezone
+from django.utils.cache import add_never_cache_headers, patch_cache_control
+from django.utils.http import urlencode
 from .models import ShortURL, UserProfile
+from . import bulk, clicks, events, exports, lookup, metrics, qr, search
+from . import otp as otp_store
+from .pagination import keyset_page
+from .ratelimit import ratelimit
+from .routers import use_replica
+from .utils import generate_short_key
 
 def home(request):
     if request.user.is_authenticated:
@@ -23,11 +28,8 @@ def home(request):
     return render(request, "home.html")
 
 
-def generate_short_code(length=6):
-    return "".join(random.choices(string.ascii_letters + string.digits, k=length))
-
-
 #web views for registration, login, logout
+@ratelimit("register", methods=("POST",))
 def register_view(request):
     if request.method == "POST":
         full_name = request.POST.get("full_name")
@@ -57,6 +59,7 @@ def register_view(request):
     return render(request, "register.html")
 
 
+@ratelimit("login", methods=("POST",))
 def login_view(request):
     if request.method == "POST":
         username = request.POST.get("username")
@@ -74,7 +77,8 @@ def login_view(request):
             except User.DoesNotExist:
                 username = None
 
-        user = authenticate(username=username, password=password)
+        with metrics.timer("auth_check_seconds", view="login"):
+            user = authenticate(username=username, password=password)
         if user:
             try:
                 profile = user.userprofile
@@ -131,33 +135,159 @@ def logout_view(request):
     return redirect("home")
 
 
+DASHBOARD_SORTS = {
+    "newest": ("-created_at", "-id"),
+    "oldest": ("created_at", "id"),
+    "most_clicked": ("-clicks", "-id"),
+    "least_clicked": ("clicks", "id"),
+}
+
+
 @login_required
+@use_replica
 def dashboard(request):
-    urls = ShortURL.objects.filter(user=request.user).order_by("-created_at")
-    return render(request, "dashboard.html", {"urls": urls})
+    sort = request.GET.get("sort", "newest")
+    if sort not in DASHBOARD_SORTS:
+        sort = "newest"
+
+    query = request.GET.get("q", "").strip()
+
+    user_urls = ShortURL.objects.filter(user=request.user)
+    summary = user_urls.aggregate(total_links=Count("id"), total_clicks=Sum("clicks"))
+    try:
+        urls, next_cursor = keyset_page(
+            search.search_links(user_urls, query), DASHBOARD_SORTS[sort],
+            settings.DASHBOARD_PAGE_SIZE, request.GET.get("cursor"),
+        )
+    except ValueError:
+        return redirect(f"{request.path}?{urlencode({'sort': sort, 'q': query})}")
+
+    return render(request, "dashboard.html", {
+        "urls": urls,
+        "sort": sort,
+        "query": query,
+        "next_cursor": next_cursor,
+        "is_first_page": not request.GET.get("cursor"),
+        "total_links": summary["total_links"],
+        "total_clicks": summary["total_clicks"] or 0,
+    })
+
+
+@login_required
+@use_replica
+def export_urls(request):
+    """Download all of the user's links with click totals (?format=csv|jsonl)"""
+    fmt = request.GET.get("format", "csv")
+    if fmt not in exports.FORMATS:
+        fmt = "csv"
+    urls = ShortURL.objects.filter(user=request.user)
+    response = StreamingHttpResponse(
+        # Bind the alias now: the body is read after the view returns
+        exports.export_rows(urls.using(urls.db), fmt, lambda key: build_short_url(request, key)),
+        content_type=exports.FORMATS[fmt],
+    )
+    filename = f"shortify-links-{timezone.now():%Y%m%d}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def dedupe_requested(value):
+    """Read a per-request "dedupe" flag, falling back to SHORTURL_DEDUPE_DEFAULT"""
+    if value is None or value == "":
+        return settings.SHORTURL_DEDUPE_DEFAULT
+    return str(value).lower() in ("1", "true", "yes", "on")
 
 
 @login_required
+@ratelimit("create", methods=("POST",))
 def create_url(request):
     if request.method == "POST":
         original_url = request.POST.get("url")
 
+        # Unchecked checkboxes aren't submitted, so absence means "no"
+        if request.POST.get("dedupe") == "on" and bulk.find_existing_link(request.user, original_url):
+            messages.info(request, "You already have a short link for that URL.")
+            return redirect("dashboard")
+
         ShortURL.objects.create(
             user=request.user,
             original_url=original_url,
-            short_key=generate_short_code()
+            short_key=generate_short_key()
         )
 
         return redirect("dashboard")
 
-    return render(request, "create_url.html")
+    return render(request, "create_url.html", {"dedupe_default": settings.SHORTURL_DEDUPE_DEFAULT})
+
+
+REDIRECT_STATUS = {ShortURL.REDIRECT_PERMANENT: 301, ShortURL.REDIRECT_TEMPORARY_KEEP_METHOD: 307}
+
+
+def redirect_response(entry):
+    """Redirect for a resolved link, with the caching its redirect_type asks for"""
+    response = HttpResponseRedirect(entry["original_url"])
+    response.status_code = REDIRECT_STATUS.get(entry["redirect_type"], 302)
+    if entry["redirect_type"] not in ShortURL.CACHEABLE_REDIRECTS:
+        # Every click comes back to us (and gets counted)
+        add_never_cache_headers(response)
+        return response
+    max_age = entry["cache_max_age"]
+    if max_age is None:
+        max_age = settings.REDIRECT_CACHE_MAX_AGE
+    if entry["expires_at"] is not None:
+        # Don't let a cache keep serving the link after it expires
+        remaining = (entry["expires_at"] - timezone.now()).total_seconds()
+        max_age = min(max_age, max(0, int(remaining)))
+    # Same answer for every client, so one shared (CDN) copy serves everyone
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
 
 
+@ratelimit("redirect")
+@use_replica(check_pin=False)
 def redirect_url(request, code):
-    url = get_object_or_404(ShortURL, short_key=code)
-    url.clicks += 1
-    url.save()
-    return HttpResponseRedirect(url.original_url)
+    entry = lookup.resolve(code)
+    if entry is None:
+        raise Http404("No ShortURL matches the given query.")
+    if lookup.is_expired(entry):
+        return HttpResponseGone("This link has expired.")
+    clicks.record(entry["id"])
+    events.enqueue(code, request)
+    return redirect_response(entry)
+
+
+@ratelimit("redirect")
+@use_replica(check_pin=False)
+async def redirect_url_async(request, code):
+    """redirect_url for ASGI deployments (enabled with ASYNC_REDIRECT=True)"""
+    entry = await lookup.aresolve(code)
+    if entry is None:
+        raise Http404("No ShortURL matches the given query.")
+    if lookup.is_expired(entry):
+        return HttpResponseGone("This link has expired.")
+    await clicks.arecord(entry["id"])
+    events.enqueue(code, request)
+    return redirect_response(entry)
+
+
+def apply_redirect_policy(url, data):
+    """Set redirect_type / cache_max_age from form or JSON ``data``; returns an error or None"""
+    redirect_type = data.get("redirect_type", url.redirect_type)
+    if redirect_type not in dict(ShortURL.REDIRECT_CHOICES):
+        return "redirect_type must be one of " + ", ".join(dict(ShortURL.REDIRECT_CHOICES))
+    max_age = data.get("cache_max_age", url.cache_max_age)
+    if max_age in ("", None):
+        max_age = None
+    else:
+        try:
+            max_age = int(max_age)
+        except (TypeError, ValueError):
+            max_age = -1
+        if max_age < 0:
+            return "cache_max_age must be a whole number of seconds"
+    url.redirect_type = redirect_type
+    url.cache_max_age = max_age
+    return None
 
 
 @login_required
@@ -166,10 +296,18 @@ def edit_url(request, id):
     
     if request.method == "POST":
         url.original_url = request.POST.get("url", url.original_url)
-        url.save()
-        return redirect("dashboard")
+        error = apply_redirect_policy(url, request.POST)
+        if error:
+            messages.error(request, error)
+        else:
+            url.save()
+            return redirect("dashboard")
     
-    return render(request, "edit_url.html", {"url": url})
+    return render(request, "edit_url.html", {
+        "url": url,
+        "redirect_choices": ShortURL.REDIRECT_CHOICES,
+        "default_cache_max_age": settings.REDIRECT_CACHE_MAX_AGE,
+    })
 
 
 @login_required
@@ -179,223 +317,50 @@ def delete_url(request, id):
     return redirect("dashboard")
 
 
-#Api views for registration and URL CRUD
-@api_view(["POST"])
-def api_register(request):
-    username = request.data.get("username")
-    password = request.data.get("password")
-
-    if User.objects.filter(username=username).exists():
-        return Response({"error": "Username already exists"}, status=400)
-
-    User.objects.create_user(username=username, password=password)
-    return Response({"message": "User registered successfully"}, status=201)
+def metrics_view(request):
+    """Prometheus scrape endpoint for this worker (opt-in via METRICS_ENABLED)"""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    token = settings.METRICS_TOKEN
+    auth = request.headers.get("Authorization", "")
+    authorized = bool(token) and hmac.compare_digest(auth, f"Bearer {token}")
+    if not authorized and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
-
-@api_view(["POST", "GET"])
-@permission_classes([IsAuthenticated])
-def api_urls(request):
-    """
-    POST  -> Create short URL
-    GET   -> List user's URLs
-    """
-
-    if request.method == "POST":
-        original_url = request.data.get("url")
-
-        short = ShortURL.objects.create(
-            user=request.user,
-            original_url=original_url,
-            short_key=generate_short_code()
-        )
-
-        return Response({
-            "id": short.id,
-            "short_key": short.short_key,
-            "original_url": short.original_url
-        }, status=201)
-
-    if request.method == "GET":
-        urls = ShortURL.objects.filter(user=request.user).values(
-            "id", "original_url", "short_key", "clicks", "created_at"
-        )
-        return Response(list(urls))
-
-
-@api_view(["GET", "PUT", "DELETE"])
-@permission_classes([IsAuthenticated])
-def api_url_detail(request, id):
-    """
-    GET    -> Retrieve single URL
-    PUT    -> Update URL
-    DELETE -> Delete URL
-    """
-
-    url = get_object_or_404(ShortURL, id=id, user=request.user)
-
-    if request.method == "GET":
-        return Response({
-            "id": url.id,
-            "original_url": url.original_url,
-            "short_key": url.short_key,
-            "clicks": url.clicks,
-            "created_at": url.created_at
-        })
-
-    if request.method == "PUT":
-        url.original_url = request.data.get("url", url.original_url)
-        url.save()
-        return Response({"message": "URL updated successfully"})
-
-    if request.method == "DELETE":
-        url.delete()
-        return Response({"message": "URL deleted successfully"})
+def build_short_url(request, short_key):
+    """Absolute URL for a short key, forced to HTTPS if configured"""
+    short_url = request.build_absolute_uri(f'/{short_key}/')
+    if getattr(settings, 'USE_HTTPS', False):
+        short_url = short_url.replace('http://', 'https://')
+    return short_url
 
 
 @login_required
 def generate_qr_code(request, id):
     
     url = get_object_or_404(ShortURL, id=id, user=request.user)
-    
-    # Build the full shortened URL
-    short_url = request.build_absolute_uri(f'/{url.short_key}/')
-    
-    # Force HTTPS if configured
-    if getattr(settings, 'USE_HTTPS', False):
-        short_url = short_url.replace('http://', 'https://')
-    
-    # Generate QR code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(short_url)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to base64 for embedding in HTML
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    img_str = base64.b64encode(buffer.getvalue()).decode()
+    short_url = build_short_url(request, url.short_key)
     
     return render(request, 'qr_code.html', {
         'url': url,
         'short_url': short_url,
-        'qr_code': img_str
+        'qr_code': qr.render_base64(short_url)
     })
 
 
 @login_required
 def download_qr_code(request, id):
-    """Download QR code as PNG file"""
-    from django.conf import settings
+    """Download QR code as PNG (default) or SVG, with ?size= and ?ec= options"""
     url = get_object_or_404(ShortURL, id=id, user=request.user)
+    short_url = build_short_url(request, url.short_key)
+    box_size, error_correction, fmt = qr.options_from_request(request)
     
-    # Build the full shortened URL
-    short_url = request.build_absolute_uri(f'/{url.short_key}/')
-    
-    # Force HTTPS if configured
-    if getattr(settings, 'USE_HTTPS', False):
-        short_url = short_url.replace('http://', 'https://')
-    
-    # Generate QR code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
+    return qr.image_response(
+        request, short_url, box_size, error_correction, fmt,
+        filename=f"qr_code_{url.short_key}",
     )
-    qr.add_data(short_url)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Create response with PNG image
-    response = HttpResponse(content_type='image/png')
-    response['Content-Disposition'] = f'attachment; filename="qr_code_{url.short_key}.png"'
-    img.save(response, 'PNG')
-    
-    return response
-
-
-@login_required
-def setup_two_fa(request):
-    """Setup 2FA for user"""
-    profile = request.user.userprofile
-    
-    if profile.two_factor_enabled:
-        messages.warning(request, "2FA is already enabled. Disable it first to set it up again.")
-        return redirect("settings")
-    
-    # Generate new secret if not in session
-    if 'temp_2fa_secret' not in request.session:
-        secret = pyotp.random_base32()
-        request.session['temp_2fa_secret'] = secret
-    else:
-        secret = request.session['temp_2fa_secret']
-    
-    # Generate QR code
-    totp = pyotp.TOTP(secret)
-    qr_uri = totp.provisioning_uri(name=request.user.email, issuer_name='URL Shortener')
-    
-    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
-    qr.add_data(qr_uri)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    qr_code_base64 = base64.b64encode(buffer.getvalue()).decode()
-    
-    if request.method == "POST":
-        code = request.POST.get("code")
-        if totp.verify(code):
-            profile.two_factor_secret = secret
-            profile.two_factor_enabled = True
-            backup_codes = profile.generate_backup_codes()
-            profile.save()
-            del request.session['temp_2fa_secret']
-            return render(request, "two_fa_backup_codes.html", {"backup_codes": backup_codes})
-        else:
-            messages.error(request, "Invalid code. Please try again.")
-    
-    return render(request, "two_fa_setup.html", {
-        "qr_code": qr_code_base64,
-        "secret": secret,
-        "email": request.user.email
-    })
-
-
-@login_required
-def disable_two_fa(request):
-    """Disable 2FA"""
-    profile = request.user.userprofile
-    
-    if not profile.two_factor_enabled:
-        messages.warning(request, "2FA is not enabled.")
-        return redirect("settings")
-    
-    if request.method == "POST":
-        code = request.POST.get("code")
-        totp = profile.get_totp()
-        
-        if totp and (totp.verify(code) or code in json.loads(profile.backup_codes or "[]")):
-            profile.two_factor_enabled = False
-            profile.two_factor_secret = None
-            profile.backup_codes = None
-            profile.save()
-            messages.success(request, "2FA has been disabled.")
-            return redirect("settings")
-        else:
-            messages.error(request, "Invalid code.")
-    
-    return render(request, "two_fa_disable.html")
 
 
 @login_required
@@ -408,20 +373,16 @@ def settings_view(request):
     })
 
 # OTP-based Password Reset Views
+@ratelimit("otp_request", methods=("POST",))
 def password_reset_otp_request(request):
     """Request OTP for password reset"""
     if request.method == "POST":
         email = request.POST.get("email")
         try:
             user = User.objects.get(email=email)
-            # Generate 6-digit OTP
-            otp = str(random.randint(100000, 999999))
-            
-            # Save OTP to database
-            from .models import PasswordResetOTP
-            PasswordResetOTP.objects.create(user=user, otp=otp)
+            otp = otp_store.issue(user, email)
             
-            # Send OTP via email
+            # Queue the OTP email; shortener.mail delivers it off the request path
             from django.core.mail import send_mail
             subject = "Password Reset OTP - URL Shortener"
             message = f"""
@@ -429,7 +390,7 @@ def password_reset_otp_request(request):
             
             Your OTP for password reset is: {otp}
             
-            This OTP will expire in 10 minutes.
+            This OTP will expire in {settings.OTP_TTL // 60} minutes.
             
             If you didn't request this, please ignore this email.
             
@@ -446,6 +407,7 @@ def password_reset_otp_request(request):
     return render(request, "password_reset_otp.html")
 
 
+@ratelimit("otp_verify", methods=("POST",))
 def verify_otp(request, email):
     """Verify OTP and show password reset form"""
     if request.method == "POST":
@@ -453,43 +415,30 @@ def verify_otp(request, email):
         new_password = request.POST.get("new_password")
         confirm_password = request.POST.get("confirm_password")
         
-        try:
-            user = User.objects.get(email=email)
-            from .models import PasswordResetOTP
-            
-            # Get the latest OTP for this user
-            otp_record = PasswordResetOTP.objects.filter(user=user, is_used=False).latest('created_at')
-            
-            if not otp_record.is_valid():
-                messages.error(request, "OTP has expired. Please request a new one.")
-                return redirect("password_reset_otp_request")
-            
-            if otp_record.otp != otp:
-                messages.error(request, "Invalid OTP. Please try again.")
-                return render(request, "verify_otp.html", {"email": email})
-            
-            if new_password != confirm_password:
-                messages.error(request, "Passwords do not match.")
-                return render(request, "verify_otp.html", {"email": email})
-            
-            if len(new_password) < 8:
-                messages.error(request, "Password must be at least 8 characters long.")
-                return render(request, "verify_otp.html", {"email": email})
-            
-            # Update password and mark OTP as used
-            user.set_password(new_password)
-            user.save()
-            otp_record.is_used = True
-            otp_record.save()
-            
-            messages.success(request, "Password reset successfully. Please login with your new password.")
-            return redirect("login")
+        # Check the form first so a typo doesn't use up the code
+        if new_password != confirm_password:
+            messages.error(request, "Passwords do not match.")
+            return render(request, "verify_otp.html", {"email": email})
         
+        if not new_password or len(new_password) < 8:
+            messages.error(request, "Password must be at least 8 characters long.")
+            return render(request, "verify_otp.html", {"email": email})
+        
+        user_id = otp_store.consume(email, otp)
+        if user_id is None:
+            messages.error(request, "Invalid or expired OTP. Please try again or request a new one.")
+            return render(request, "verify_otp.html", {"email": email})
+        
+        try:
+            user = User.objects.get(pk=user_id)
         except User.DoesNotExist:
             messages.error(request, "User not found.")
             return redirect("password_reset_otp_request")
-        except PasswordResetOTP.DoesNotExist:
-            messages.error(request, "No OTP found. Please request a new one.")
-            return redirect("password_reset_otp_request")
+        
+        user.set_password(new_password)
+        user.save()
+        
+        messages.success(request, "Password reset successfully. Please login with your new password.")
+        return redirect("login")
     
     return render(request, "verify_otp.html", {"email": email})